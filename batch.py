@@ -0,0 +1,130 @@
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import time
+
+import chess
+
+from chess_engine import ChessEngine
+
+# Processes are spawned so they're safe to start from the threaded server
+context = mp.get_context("spawn")
+
+# Engine owned by each pool process, kept between positions
+engine = None
+
+
+def initWorker(ttMb, bookPath):
+    global engine
+    engine = ChessEngine(bookPath=bookPath, tt_mb=ttMb)
+
+
+# Runs in a pool process, item is (index, fen, id, depth, maxTime)
+def analysePosition(item):
+    index, fen, itemId, depth, maxTime = item
+    result = {"index": index, "fen": fen}
+    if itemId is not None:
+        result["id"] = itemId
+
+    start = time.perf_counter()
+    try:
+        board = chess.Board(fen)
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+
+    # Parsable but impossible positions (pawns on the back rank, missing kings...)
+    if not board.is_valid():
+        result["error"] = f"invalid position: {board.status().name.lower()}"
+        return result
+
+    # One failing position mustn't end the stream for the others
+    try:
+        move = engine.findBestMove(board, maxTime=maxTime if maxTime else float("inf"), maxDepth=depth)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    result.update({
+        "bestMove": move.uci() if move else None,
+        "depth": engine.searchDepth,
+        "nodes": engine.nodes,
+        "time": round(time.perf_counter() - start, 4),
+    })
+    return result
+
+
+# Reads positions from JSONL lines: {"fen": ..., "id": ...} objects, bare JSON
+# strings or plain FEN text. Lines without a FEN are skipped
+def readPositions(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            yield line, None
+            continue
+        if isinstance(item, str):
+            yield item, None
+        elif isinstance(item, dict) and isinstance(item.get("fen"), str):
+            yield item["fen"], item.get("id")
+
+
+class BatchAnalyser:
+
+    # Pool of processes that each hold their own ChessEngine
+    def __init__(self, processes=None, ttMb=16, bookPath="Perfect2023.bin"):
+        self.pool = context.Pool(processes, initializer=initWorker, initargs=(ttMb, bookPath))
+
+    # Yields one result dict per position as soon as it finishes, so the order
+    # is completion order. Each position gets a fixed depth, a fixed time or both
+    def analyse(self, positions, depth=None, maxTime=None):
+        if depth is None and maxTime is None:
+            maxTime = 1.0
+        items = (
+            (index, fen, itemId, depth, maxTime)
+            for index, (fen, itemId) in enumerate(positions)
+        )
+        yield from self.pool.imap_unordered(analysePosition, items)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse many FENs, printing NDJSON results in completion order")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL or FEN-per-line file, - for stdin")
+    parser.add_argument("--depth", type=int, help="fixed depth per position")
+    parser.add_argument("--time", type=float, help="seconds per position")
+    parser.add_argument("--processes", type=int, help="pool size, defaults to the number of cores")
+    parser.add_argument("--tt-mb", type=int, default=16, help="hash table size per process")
+    parser.add_argument("--book", default="Perfect2023.bin", help="opening book, empty to disable")
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    with source:
+        positions = list(readPositions(source))
+
+    analyser = BatchAnalyser(args.processes, args.tt_mb, args.book or None)
+    start = time.perf_counter()
+    done = 0
+    try:
+        for result in analyser.analyse(positions, args.depth, args.time):
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+
+            # Progress and throughput go to stderr so stdout stays NDJSON
+            done += 1
+            elapsed = time.perf_counter() - start
+            sys.stderr.write(f"\r{done}/{len(positions)} positions  {done / elapsed:.1f}/s")
+    finally:
+        analyser.close()
+    sys.stderr.write("\n")
+
+
+if __name__ == "__main__":
+    main()
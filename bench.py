@@ -0,0 +1,203 @@
+import argparse
+import json
+import platform
+import time
+
+import chess
+
+from chess_engine import ChessEngine
+
+# Fixed positions so runs on different machines and commits are comparable.
+# Changing this list changes the node signature, so bump SUITE_VERSION with it
+SUITE_VERSION = 1
+SUITE = {
+    "middlegame": [
+        "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+        "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP3PPP/R2QKB1R w KQ - 0 8",
+        "2r2rk1/pp1bqppp/2n1pn2/3p4/3P4/2PBPN2/P1Q2PPP/R4RK1 b - - 5 14",
+        "r2q1rk1/ppp2ppp/2np1n2/2b1p1B1/2B1P1b1/2NP1N2/PPP2PPP/R2Q1RK1 w - - 6 8",
+    ],
+    "endgame": [
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        "6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1",
+        "8/8/4k3/8/2p5/8/1P2K3/8 w - - 0 1",
+        "8/5pk1/6p1/8/3R4/6P1/5PK1/3r4 b - - 0 40",
+    ],
+    "tactical": [
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - 0 1",
+        "5rk1/1ppb3p/p1pb4/6q1/3P1p1r/2P1R2P/PP1BQ1P1/5RKN w - - 0 1",
+        "3r1k2/4npp1/1ppr3p/p6P/P2PPPP1/1NR5/5K2/2R5 w - - 0 1",
+    ],
+}
+
+POSITIONS = [fen for fens in SUITE.values() for fen in fens]
+
+# Engine switches for each search technique, by command line name
+FEATURES = {
+    "pvs": "usePvs",
+    "null-move": "useNullMove",
+    "lmr": "useLmr",
+    "check-extension": "useCheckExtension",
+    "aspiration": "useAspiration",
+}
+
+
+# Average growth in nodes from one completed iteration to the next
+def branchingFactor(iterations):
+    perDepth = []
+    previous = 0
+    for iteration in iterations:
+        perDepth.append(iteration["nodes"] - previous)
+        previous = iteration["nodes"]
+    perDepth = [n for n in perDepth if n > 0]
+    if len(perDepth) < 2:
+        return None
+    return round((perDepth[-1] / perDepth[0]) ** (1 / (len(perDepth) - 1)), 3)
+
+
+def rate(part, whole):
+    return round(part / whole, 4) if whole else 0.0
+
+
+# Searches every suite position from a clean engine, at a fixed depth or for a
+# fixed time, and collects the counters. At a fixed depth the total node count,
+# quiescence nodes included, is a signature that only changes when the search
+# itself changes. disabled names FEATURES to switch off
+def runSuite(depth=None, maxTime=None, ttMb=16, disabled=()):
+    engine = ChessEngine(bookPath=None, tt_mb=ttMb)
+    for name in disabled:
+        setattr(engine, FEATURES[name], False)
+    positions = []
+    totals = dict.fromkeys(("nodes", "qnodes", "ttProbes", "ttHits", "ttCutoffs", "betaCutoffs", "firstMoveCutoffs"), 0)
+    elapsed = 0.0
+
+    for category, fens in SUITE.items():
+        for fen in fens:
+            engine.newGame()
+            start = time.perf_counter()
+            move = engine.findBestMove(chess.Board(fen), maxTime=maxTime or float("inf"), maxDepth=depth)
+            seconds = time.perf_counter() - start
+            elapsed += seconds
+
+            for name in totals:
+                totals[name] += getattr(engine, name)
+            positions.append({
+                "category": category,
+                "fen": fen,
+                "bestMove": move.uci() if move else None,
+                "depth": engine.searchDepth,
+                "nodes": engine.nodes,
+                "qnodes": engine.qnodes,
+                "time": round(seconds, 4),
+                "nps": int((engine.nodes + engine.qnodes) / seconds) if seconds else 0,
+                "ebf": branchingFactor(engine.iterations),
+            })
+
+    ebfs = [p["ebf"] for p in positions if p["ebf"]]
+    return {
+        "suiteVersion": SUITE_VERSION,
+        "mode": "depth" if depth else "time",
+        "limit": depth if depth else maxTime,
+        "disabled": sorted(disabled),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "positions": positions,
+        "totals": {
+            "nodes": totals["nodes"],
+            "qnodes": totals["qnodes"],
+            "time": round(elapsed, 4),
+            "nps": int((totals["nodes"] + totals["qnodes"]) / elapsed) if elapsed else 0,
+            "avgDepth": round(sum(p["depth"] for p in positions) / len(positions), 2),
+            "ebf": round(sum(ebfs) / len(ebfs), 3) if ebfs else None,
+            "ttHitRate": rate(totals["ttHits"], totals["ttProbes"]),
+            "ttCutoffRate": rate(totals["ttCutoffs"], totals["ttProbes"]),
+            "firstMoveCutoffRate": rate(totals["firstMoveCutoffs"], totals["betaCutoffs"]),
+        },
+        "signature": totals["nodes"] + totals["qnodes"] if depth else None,
+    }
+
+
+# Searches every position with 1, 2, 4 ... workers and reports the depth
+# reached and nodes per second for each worker count, quiescence nodes
+# included as in runSuite
+def smpScaling(workerCounts, maxTime, ttMb):
+    results = []
+    for workers in workerCounts:
+        engine = ChessEngine(bookPath=None, tt_mb=ttMb, workers=workers)
+        nodes, qnodes, depths, elapsed = 0, 0, [], 0.0
+        try:
+            # Starts the helper processes outside the timed searches
+            engine.findBestMove(chess.Board(), 0.05)
+            for fen in POSITIONS:
+                engine.newGame()
+                start = time.perf_counter()
+                engine.findBestMove(chess.Board(fen), maxTime)
+                elapsed += time.perf_counter() - start
+                nodes += engine.nodes
+                qnodes += engine.qnodes
+                depths.append(engine.searchDepth)
+        finally:
+            engine.close()
+
+        results.append({
+            "workers": workers,
+            "nodes": nodes,
+            "qnodes": qnodes,
+            "nps": int((nodes + qnodes) / elapsed) if elapsed else 0,
+            "avgDepth": round(sum(depths) / len(depths), 2),
+            "depths": depths,
+        })
+    return results
+
+
+# Runs the suite with everything on, then with each technique switched off in
+# turn, so the node count each one saves shows up side by side
+def ablation(depth, ttMb):
+    runs = [("all", ())] + [(f"no {name}", (name,)) for name in FEATURES]
+    results = []
+    for label, disabled in runs:
+        totals = runSuite(depth, None, ttMb, disabled)["totals"]
+        results.append({"run": label, "nodes": totals["nodes"], "qnodes": totals["qnodes"],
+                        "time": totals["time"], "ebf": totals["ebf"]})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine benchmarks, results are printed as JSON")
+    sub = parser.add_subparsers(dest="command")
+
+    run = sub.add_parser("run", help="fixed depth or fixed time run over the position suite (default)")
+    limit = run.add_mutually_exclusive_group()
+    limit.add_argument("--depth", type=int, help="fixed depth per position (default 5)")
+    limit.add_argument("--time", type=float, help="seconds per position")
+    run.add_argument("--tt-mb", type=int, default=16)
+    for name in FEATURES:
+        run.add_argument(f"--no-{name}", dest="disabled", action="append_const", const=name,
+                         help=f"switch off {name.replace('-', ' ')}")
+
+    abl = sub.add_parser("ablation", help="fixed depth runs with each search technique switched off in turn")
+    abl.add_argument("--depth", type=int, default=5)
+    abl.add_argument("--tt-mb", type=int, default=16)
+
+    smp = sub.add_parser("smp", help="parallel search scaling over worker counts")
+    smp.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    smp.add_argument("--time", type=float, default=2.0, help="seconds per position")
+    smp.add_argument("--tt-mb", type=int, default=64)
+
+    args = parser.parse_args()
+    if args.command == "smp":
+        print(json.dumps(smpScaling(args.workers, args.time, args.tt_mb), indent=2))
+    elif args.command == "ablation":
+        print(json.dumps(ablation(args.depth, args.tt_mb), indent=2))
+    else:
+        depth = getattr(args, "depth", None)
+        maxTime = getattr(args, "time", None)
+        if depth is None and maxTime is None:
+            depth = 5
+        print(json.dumps(runSuite(depth, maxTime, getattr(args, "tt_mb", 16),
+                                  getattr(args, "disabled", None) or ()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import argparse
+import array
+import random
+import struct
+from collections import defaultdict
+
+import chess
+import chess.pgn
+import chess.polyglot
+
+# Polyglot entry: key, move, weight, learn (big endian)
+ENTRY = struct.Struct(">QHHI")
+
+# Polyglot stores castling as the king capturing its own rook
+CASTLING_TO_ROOK = {
+    (chess.E1, chess.G1): chess.H1, (chess.E1, chess.C1): chess.A1,
+    (chess.E8, chess.G8): chess.H8, (chess.E8, chess.C8): chess.A8,
+}
+ROOK_TO_CASTLING = {(frm, rook): to for (frm, to), rook in CASTLING_TO_ROOK.items()}
+
+# Books already compiled in this process, shared by every engine that opens them
+loaded = {}
+
+
+# Reads a polyglot file into key -> {polyglot move: weight}
+def readPolyglot(path):
+    moves = defaultdict(dict)
+    with open(path, "rb") as f:
+        data = f.read()
+    for key, raw, weight, _ in ENTRY.iter_unpack(data[:len(data) - len(data) % ENTRY.size]):
+        moves[key][raw] = moves[key].get(raw, 0) + weight
+    return moves
+
+
+# Builds the index for a list of books. Each book is a path or (path, weight).
+# With merge="priority" the first book that knows a position decides it,
+# with merge="weighted" the moves of every book are added up, scaled by the
+# book's weight
+def compileBooks(books, merge="priority"):
+    index = {}
+    combined = defaultdict(lambda: defaultdict(float))
+    for book in books:
+        path, bookWeight = (book, 1.0) if isinstance(book, str) else book
+        for key, moves in readPolyglot(path).items():
+            if merge == "priority":
+                if key not in index:
+                    index[key] = moves
+            else:
+                for raw, weight in moves.items():
+                    combined[key][raw] += weight * bookWeight
+    if merge != "priority":
+        index = combined
+
+    # Packs each position into an array of (move << 16 | weight), best first,
+    # scaling weights so they still fit in 16 bits after merging
+    packed = {}
+    for key, moves in index.items():
+        top = max(moves.values())
+        scale = 0xFFFF / top if top > 0xFFFF else 1
+        entries = sorted(((raw, int(weight * scale)) for raw, weight in moves.items()),
+                         key=lambda e: -e[1])
+        packed[key] = array.array("I", (raw << 16 | weight for raw, weight in entries))
+    return packed
+
+
+# Turns a polyglot move into a chess.Move for the given board
+def decodePolyglot(board: chess.Board, raw):
+    frm = (raw >> 6) & 0x3F
+    to = raw & 0x3F
+    promo = (raw >> 12) & 0x7
+    if (frm, to) in ROOK_TO_CASTLING and board.piece_type_at(frm) == chess.KING:
+        to = ROOK_TO_CASTLING[(frm, to)]
+    return chess.Move(frm, to, promo + 1 if promo else None)
+
+
+def encodePolyglot(board: chess.Board, move: chess.Move):
+    to = move.to_square
+    if (move.from_square, to) in CASTLING_TO_ROOK and board.piece_type_at(move.from_square) == chess.KING:
+        to = CASTLING_TO_ROOK[(move.from_square, to)]
+    promo = move.promotion - 1 if move.promotion else 0
+    return to | (move.from_square << 6) | (promo << 12)
+
+
+class OpeningBook:
+
+    # Compiles the books once per process into a hashed index, so a probe is
+    # one dict lookup with no file access. rng makes choices reproducible
+    def __init__(self, books, merge="priority", rng=None):
+        if isinstance(books, str):
+            books = [books]
+        books = tuple(b if isinstance(b, str) else tuple(b) for b in books)
+        if (books, merge) not in loaded:
+            loaded[(books, merge)] = compileBooks(books, merge)
+        self.index = loaded[(books, merge)]
+        self.rng = rng or random
+
+    def __len__(self):
+        return len(self.index)
+
+    # Returns every legal (move, weight) for the position, best first
+    def moves(self, board: chess.Board, key=None):
+        entries = self.index.get(chess.polyglot.zobrist_hash(board) if key is None else key)
+        if not entries:
+            return []
+        result = []
+        for entry in entries:
+            move = decodePolyglot(board, entry >> 16)
+            if board.is_legal(move):
+                result.append((move, entry & 0xFFFF))
+        return result
+
+    # Picks a move at random in proportion to its weight, None out of book.
+    # Only the chosen move is checked for legality (a key collision could
+    # point at moves from another position)
+    def weightedChoice(self, board: chess.Board, key=None):
+        entries = list(self.index.get(chess.polyglot.zobrist_hash(board) if key is None else key, ()))
+        while entries:
+            total = sum(entry & 0xFFFF for entry in entries)
+            if total:
+                pick = self.rng.randrange(total)
+                for i, entry in enumerate(entries):
+                    pick -= entry & 0xFFFF
+                    if pick < 0:
+                        break
+            else:
+                i = self.rng.randrange(len(entries))
+
+            move = decodePolyglot(board, entries[i] >> 16)
+            if board.is_legal(move):
+                return move
+            del entries[i]
+        return None
+
+    # Writes the index back out as a polyglot file (sorted by key)
+    def save(self, path):
+        with open(path, "wb") as f:
+            for key in sorted(self.index):
+                for entry in self.index[key]:
+                    f.write(ENTRY.pack(key, entry >> 16, entry & 0xFFFF, 0))
+
+
+# Builds a polyglot book from PGN games. Every move played in the first maxPly
+# plies is weighted 2 for a win and 1 for a draw from the mover's side, and
+# moves played fewer than minGames times are dropped
+def buildBook(pgnPaths, outPath, maxPly=24, minGames=2):
+    stats = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+    for path in pgnPaths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                result = game.headers.get("Result", "*")
+                points = {"1-0": (2, 0), "0-1": (0, 2), "1/2-1/2": (1, 1)}.get(result, (0, 0))
+
+                board = game.board()
+                for ply, move in enumerate(game.mainline_moves()):
+                    if ply >= maxPly:
+                        break
+                    entry = stats[chess.polyglot.zobrist_hash(board)][encodePolyglot(board, move)]
+                    entry[0] += 1
+                    entry[1] += points[0] if board.turn == chess.WHITE else points[1]
+                    board.push(move)
+
+    entries = []
+    for key, moves in stats.items():
+        kept = {raw: score for raw, (games, score) in moves.items() if games >= minGames}
+        if not kept:
+            continue
+        top = max(kept.values()) or 1
+        scale = 0xFFFF / top if top > 0xFFFF else 1
+        for raw, score in kept.items():
+            entries.append((key, -int(score * scale), raw))
+
+    entries.sort()
+    with open(outPath, "wb") as f:
+        for key, weight, raw in entries:
+            f.write(ENTRY.pack(key, raw, -weight, 0))
+    return len(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Opening book tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="compile a polyglot book from PGN files")
+    build.add_argument("pgn", nargs="+")
+    build.add_argument("-o", "--output", required=True)
+    build.add_argument("--max-ply", type=int, default=24)
+    build.add_argument("--min-games", type=int, default=2)
+
+    merge = sub.add_parser("merge", help="merge polyglot books, earlier books take priority")
+    merge.add_argument("books", nargs="+")
+    merge.add_argument("-o", "--output", required=True)
+    merge.add_argument("--weighted", action="store_true", help="add up the weights of every book instead")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        count = buildBook(args.pgn, args.output, args.max_ply, args.min_games)
+        print(f"wrote {count} entries to {args.output}")
+    else:
+        book = OpeningBook(args.books, "weighted" if args.weighted else "priority")
+        book.save(args.output)
+        print(f"wrote {len(book)} positions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,46 @@
 import chess
-import chess.polyglot 
+import contextlib
 import random
 import time
 
-# Piece square tables
-king_mid = [0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, -5, -5, -5, 0, 0,
-            0, 0, 10, -5, -5, -5, 10, 0]
-
-queen_mid = [-20, -10, -10, -5, -5, -10, -10, -20,
-             -10, 0, 0, 0, 0, 0, 0, -10,
-             -10, 0, 5, 5, 5, 5, 0, -10,
-             -5, 0, 5, 5, 5, 5, 0, -5,
-             -5, 0, 5, 5, 5, 5, 0, -5,
-             -10, 5, 5, 5, 5, 5, 0, -10,
-             -10, 0, 5, 0, 0, 0, 0, -10,
-             -20, -10, -10, 0, 0, -10, -10, -20]
-
-rook_mid = [10, 10, 10, 10, 10, 10, 10, 10,
-            10, 10, 10, 10, 10, 10, 10, 10,
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 0, 0, 0, 0, 0,
-            0, 0, 0, 10, 10, 0, 0, 0,
-            0, 0, 0, 10, 10, 5, 0, 0]
-
-bishop_mid = [0, 0, 0, 0, 0, 0, 0, 0,
-              0, 0, 0, 0, 0, 0, 0, 0,
-              0, 0, 0, 0, 0, 0, 0, 0,
-              0, 10, 0, 0, 0, 0, 10, 0,
-              5, 0, 10, 0, 0, 10, 0, 5,
-              0, 10, 0, 10, 10, 0, 10, 0,
-              0, 10, 0, 10, 10, 0, 10, 0,
-              0, 0, -10, 0, 0, -10, 0, 0]
-
-knight_mid = [-5, -5, -5, -5, -5, -5, -5, -5,
-              -5, 0, 0, 10, 10, 0, 0, -5,
-              -5, 5, 10, 10, 10, 10, 5, -5,
-              -5, 5, 10, 15, 15, 10, 5, -5,
-              -5, 5, 10, 15, 15, 10, 5, -5,
-              -5, 5, 10, 10, 10, 10, 5, -5,
-              -5, 0, 0, 5, 5, 0, 0, -5,
-              -5, -10, -5, -5, -5, -5, -10, -5]
-
-pawn_mid = [0, 0, 0, 0, 0, 0, 0, 0,
-            30, 30, 30, 40, 40, 30, 30, 30,
-            20, 20, 20, 30, 30, 30, 20, 20,
-            10, 10, 15, 25, 25, 15, 10, 10,
-            5, 5, 5, 20, 20, 5, 5, 5,
-            5, 0, 0, 5, 5, 0, 0, 5,
-            5, 5, 5, -10, -10, 5, 5, 5,
-            0, 0, 0, 0, 0, 0, 0, 0]
+from book import OpeningBook
+from evaluation import PSQ, boardScore, sideScore
+from position import Position, PAWN, KING, WHITE_BIT, CASTLE_ROOK
+from smp import SmpPool
+from timeman import TimeManager, SearchTimeout, CHECK_EVERY
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
 
 # Set random seed for testing purposes
 random.seed(42)
 
+# Checkmate score, anything within MATE_BOUND of it is a forced mate
+MATE = 1000000
+MATE_BOUND = MATE - 1000
+
+# Deepest ply that keeps killer moves, and the cap on history scores
+MAX_PLY = 64
+HISTORY_MAX = 1 << 20
+
+# Quiescence skips captures that can't lift the score to alpha even with this
+# much positional gain on top of the captured material
+DELTA_MARGIN = 200
+
+# Null-move pruning depth reduction and the shallowest depth it's tried at
+NULL_REDUCTION = 2
+NULL_MIN_DEPTH = 3
+
+# Late move reductions start after this many moves at this depth or deeper
+LMR_MIN_MOVES = 3
+LMR_MIN_DEPTH = 3
+
+# Root window around the previous iteration's score, widened on failure and
+# opened completely past ASPIRATION_MAX
+ASPIRATION_WINDOW = 50
+ASPIRATION_MAX = 1000
+
+# Zobrist keys come from their own generator so every engine (and process) hashes alike
+ZOBRIST_SEED = 2023
+
 
 class ChessEngine:
 
@@ -80,281 +60,650 @@ class ChessEngine:
         chess.KING: 0,
     }
 
-    pieceTables = {
-        chess.PAWN: pawn_mid,
-        chess.KNIGHT: knight_mid,
-        chess.BISHOP: bishop_mid,
-        chess.ROOK: rook_mid,
-        chess.QUEEN: queen_mid,
-        chess.KING: king_mid,
-    }
-
     # Innitializes a new chessBot
-    def __init__(self, depth=5, bookPath="Perfect2023.bin"):
+    def __init__(self, depth=5, bookPath="Perfect2023.bin", tt_mb=16, workers=1, cache=None,
+                 bookMerge="priority", bookRng=None):
         self.depth = depth
-        self.transpositionTable: dict[int, dict] = {}
+
+        # Optional ResultCache of finished searches, checked before searching
+        self.cache = cache
+
+        # Fixed size table that is kept between iterations and between moves.
+        # With several workers it lives in shared memory so helpers can use it too
+        self.smp = SmpPool(workers - 1, tt_mb) if workers > 1 else None
+        self.transpositionTable = TranspositionTable(tt_mb, self.smp.buffer if self.smp else None)
+
+        # Node counter, the time the current search has to stop by and an
+        # optional event that stops it early
+        self.nodes = 0
+        self.searchDepth = 0
+        self.lastInfo = None
+        self.deadline = float("inf")
+        self.stopFlag = None
+        self.resetCounters()
+
+        # Search techniques, switchable so their effect can be measured
+        self.usePvs = True
+        self.useNullMove = True
+        self.useLmr = True
+        self.useCheckExtension = True
+        self.useAspiration = True
+
+        # Killer moves per ply and history scores per side for [from | to << 6]
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
 
         # Instantiates zobrist hashing
+        zobristRng = random.Random(ZOBRIST_SEED)
         self.zobristTable = {
-            (piece_type, color, square): random.getrandbits(64)
+            (piece_type, color, square): zobristRng.getrandbits(64)
             for piece_type in range(1, 7)
             for color in [chess.WHITE, chess.BLACK]
             for square in chess.SQUARES
         }
-        self.zobristSide = random.getrandbits(64)
-
-        # Opens book
-        try:
-            self.book = chess.polyglot.open_reader(bookPath) 
-        except FileNotFoundError:
-            self.book = None
+        self.zobristSide = zobristRng.getrandbits(64)
+        self.zobristCastling = [0] + [zobristRng.getrandbits(64) for _ in range(15)]
+        self.zobristEp = [zobristRng.getrandbits(64) for _ in range(8)]
+
+        # Flattens the piece keys by mailbox code so positions can index them directly
+        self.zobristPieces = [0] * (16 * 64)
+        for (pieceType, color, square), value in self.zobristTable.items():
+            self.zobristPieces[(pieceType | (WHITE_BIT if color else 0)) * 64 + square] = value
+
+        # Opens book, several books can be given as a list. With bookMerge="priority"
+        # earlier ones take priority, with "weighted" their moves are added up.
+        # bookRng (a random.Random) makes book choices reproducible
+        self.book = None
+        if bookPath:
+            try:
+                self.book = OpeningBook(bookPath, bookMerge, bookRng)
+            except FileNotFoundError:
+                self.book = None
+
+    # Search counters, reset at the start of every search
+    def resetCounters(self):
+        self.nodes = 0
+        self.qnodes = 0
+        self.ttProbes = 0
+        self.ttHits = 0
+        self.ttCutoffs = 0
+        self.betaCutoffs = 0
+        self.firstMoveCutoffs = 0
+        self.nullCutoffs = 0
+        self.reductions = 0
+        self.researches = 0
+        self.aspirationFails = 0
+        self.rootMove = 0
+        self.aborted = False
+
+        # Stats for each completed iteration, counts are totals so far
+        self.iterations = []
+
+    # Forgets everything learned from earlier positions
+    def newGame(self):
+        self.transpositionTable.clear()
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        self.history = [[0] * 4096, [0] * 4096]
+
+    # Shuts down helper processes and frees the shared table
+    def close(self):
+        if self.smp:
+            self.transpositionTable.release()
+            self.smp.close()
+            self.smp = None
 
     # Method to return book move
     def bookMove(self, board):
         if not self.book:
             return None
-        try:
-            return self.book.weighted_choice(board).move
-        except IndexError:           
-            return None
-        
-    # Hashes current board using a zobrist hash
-    def computeZobristHash(self, board: chess.Board):
-        try:
-            return board.transposition_key()
-        except AttributeError:
-            return hash(board._transposition_key())
-
-    # Innitial evaluation function used for base board
-    def fullEvaluate(self, board: chess.Board):
-        score = 0
-        for sq in chess.SQUARES:
-            piece = board.piece_at(sq)
-            if not piece:
-                continue
-
-            # Engine plays black uses negative for white piece evaluation
-            factor = 1 if piece.color == chess.BLACK else -1
-            idx = sq if piece.color == chess.WHITE else chess.square_mirror(sq)
-            score += factor * (
-                self.pieceValues[piece.piece_type] + self.pieceTables[piece.piece_type][idx]
-            )
-        return score
+        return self.book.weightedChoice(board)
 
-    # Evaluates new boards by calculating the difference before and after a move
-    def deltaEval(self, board: chess.Board, move: chess.Move, currentScore: int):
+    # Converts a chess.Board into the internal position used by the search
+    def newPosition(self, board: chess.Board):
+        return Position(board, self.zobristPieces, self.zobristSide,
+                        self.zobristCastling, self.zobristEp)
         
-        # Finds original piece
-        piece = board.piece_at(move.from_square)
-        colorFactor = 1 if piece.color == chess.BLACK else -1  # + for Black, – for White
-
-        # Makes the move
-        fromIdx = move.from_square if piece.color == chess.WHITE \
-                  else chess.square_mirror(move.from_square)
-
-        # Removes score representing old position
-        currentScore -= colorFactor * (
-            self.pieceValues[piece.piece_type] + self.pieceTables[piece.piece_type][fromIdx]
-        )
-
-        # Moves piece to new square
-        promoType = move.promotion or piece.piece_type
-        toIdx = move.to_square if piece.color == chess.WHITE \
-                else chess.square_mirror(move.to_square)
-        currentScore += colorFactor * (
-            self.pieceValues[promoType] + self.pieceTables[promoType][toIdx]
-        )
-
-        # Handles capture conditions
-        if board.is_capture(move):
-            victimSq = move.to_square
-            if board.is_en_passant(move):                       
-                victimSq += 8 if piece.color == chess.WHITE else -8
-
-            capturedType = board.piece_type_at(victimSq)
-            if capturedType is not None:
-                vicIdx = victimSq if piece.color == chess.BLACK \
-                         else chess.square_mirror(victimSq)
-
-                # Handles removal of victim piece
-                currentScore += colorFactor * (
-                    self.pieceValues[capturedType] +
-                    self.pieceTables[capturedType][vicIdx]
-                )
-
-        # Handles castling case
-        if board.is_castling(move):
-            rookFrom, rookTo = (
-                (move.to_square + 1, move.to_square - 1)   
-                if chess.square_file(move.to_square) == 6  
-                else (move.to_square - 2, move.to_square + 1)  
-            )
-            for sqFrom, sqTo in [(rookFrom, rookTo)]:
-                idxFrom = sqFrom if piece.color == chess.WHITE else chess.square_mirror(sqFrom)
-                idxTo   = sqTo   if piece.color == chess.WHITE else chess.square_mirror(sqTo)
-                currentScore -= colorFactor * (
-                    self.pieceValues[chess.ROOK] + self.pieceTables[chess.ROOK][idxFrom]
-                )
-                currentScore += colorFactor * (
-                    self.pieceValues[chess.ROOK] + self.pieceTables[chess.ROOK][idxTo]
-                )
-
-        return currentScore
-
-
-    # Orders moves to improve alpha-beta prunning
-    def orderMoves(self, board, ttMove=None):
-
-        # Prioritizes capture moves
-        captures, quiets = [], []
-
-        # Starts Mvvlva move ordering
-        for mv in board.legal_moves:
-            if mv == ttMove:                 
-                return [mv] + list(board.legal_moves)
-            (captures if board.is_capture(mv) else quiets).append(mv)
-
-        # Sorts capture list by MvvLva
-        captures.sort(key=lambda m: self.mvvLvaScore[
-            board.piece_type_at(m.to_square) or chess.PAWN]
-            [board.piece_at(m.from_square).piece_type], reverse=True)
-
-        return captures + quiets
-
-
-    
-    # Uses MvvLva to score moves
-    def scoreMove(self, board, move, ttMove):
-
-        # Returns the transposition table move
-        if move == ttMove:            
-            return 1_000_000
-
-
-        # Handles capture case
-        if board.is_capture(move):
-            victimSq = move.to_square
-            if board.is_en_passant(move):
-                piece = board.piece_at(move.from_square)
-                victimSq += 8 if piece.color == chess.WHITE else -8
+    # Mate scores are stored relative to the node so they stay valid at any ply
+    def scoreToTT(self, val, ply):
+        if val >= MATE_BOUND:
+            return val + ply
+        if val <= -MATE_BOUND:
+            return val - ply
+        return val
+
+    def scoreFromTT(self, val, ply):
+        if val >= MATE_BOUND:
+            return val - ply
+        if val <= -MATE_BOUND:
+            return val + ply
+        return val
+
+    # Turns a packed move back into a chess.Move
+    def decodeMove(self, packed):
+        if not packed:
+            return None
+        return chess.Move(packed & 0x3F, (packed >> 6) & 0x3F, (packed >> 12) or None)
 
-            victim   = board.piece_type_at(victimSq) or chess.PAWN
-            attacker = board.piece_at(move.from_square).piece_type
-            return 500_000 + self.mvvLvaScore[victim][attacker]
+    # Packed midgame, endgame and phase score of a board (see evaluation.py),
+    # the starting point deltaEval updates move by move
+    def fullEvaluate(self, board: chess.Board):
+        return boardScore(board)
+
+    # Updates the packed score for a move with table lookups, before it's made
+    def deltaEval(self, pos: Position, move: int, currentScore: int):
+        frm = move & 63
+        to = (move >> 6) & 63
+        board = pos.board
+        piece = board[frm]
+        promo = move >> 12
+
+        # Moves piece to new square, promoting if needed
+        placed = (promo | (piece & WHITE_BIT)) if promo else piece
+        currentScore += PSQ[placed * 64 + to] - PSQ[piece * 64 + frm]
+
+        # Removes the captured piece, en passant takes it from behind the target
+        victimSq = to
+        if piece & 7 == PAWN and to == pos.ep:
+            victimSq += -8 if piece & WHITE_BIT else 8
+        captured = board[victimSq]
+        if captured:
+            currentScore -= PSQ[captured * 64 + victimSq]
+
+        # Castling also moves the rook
+        if piece & 7 == KING and (to - frm == 2 or frm - to == 2):
+            rookFrom, rookTo = CASTLE_ROOK[to]
+            rook = board[rookFrom]
+            currentScore += PSQ[rook * 64 + rookTo] - PSQ[rook * 64 + rookFrom]
 
-        return 0
+        return currentScore
 
 
-    # Uses a minimax algorithm with alpha beta pruning to find best move
-    def minimax(self, board, depth, score, alpha, beta, maximizing, ply=0):
+    # Yields moves in stages so a cutoff on an early move skips the rest of the
+    # generation and sorting: hash move, captures by MvvLva, killers, then
+    # quiets by history
+    def pickMoves(self, pos: Position, ttMove=0, ply=0):
+
+        # Hash move is tried before generating anything
+        if ttMove and pos.isPseudoLegal(ttMove):
+            yield ttMove
+
+        for mv in self.orderCaptures(pos):
+            if mv != ttMove:
+                yield mv
+
+        # Killer moves caused cutoffs at this ply in sibling positions
+        killers = self.killers[ply] if ply < MAX_PLY else (0, 0)
+        for mv in killers:
+            if mv and mv != ttMove and (mv >> 12) != chess.QUEEN \
+                    and pos.isPseudoLegal(mv) and not pos.isCapture(mv):
+                yield mv
+
+        # Remaining quiets, best history score first
+        history = self.history[pos.side]
+        quiets = pos.genQuiets()
+        quiets.sort(key=lambda m: history[m & 4095], reverse=True)
+        for mv in quiets:
+            if mv != ttMove and mv != killers[0] and mv != killers[1]:
+                yield mv
+
+    # Captures and queen promotions sorted by MvvLva, en passant counts as taking a pawn
+    def orderCaptures(self, pos: Position):
+        board = pos.board
+        mvvLva = self.mvvLvaScore
+        captures = pos.genCaptures()
+        captures.sort(key=lambda m: mvvLva[board[(m >> 6) & 63] & 7 or chess.PAWN]
+                      [board[m & 63] & 7], reverse=True)
+        return captures
+
+    # Remembers a quiet move that caused a beta cutoff
+    def updateQuietCutoff(self, pos: Position, move, depth, ply):
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+        history = self.history[pos.side]
+        history[move & 4095] += depth * depth
+
+        # Keeps the scores bounded so old cutoffs fade out
+        if history[move & 4095] > HISTORY_MAX:
+            for side in self.history:
+                for i in range(4096):
+                    side[i] >>= 1
+
+    # Orders every move, used at the root where all of them are searched anyway
+    def orderMoves(self, pos: Position, ttMove=0):
+        return list(self.pickMoves(pos, ttMove))
+
+
+    # Negamax alpha-beta with principal variation search: the first move gets
+    # the full window, later ones a zero window that is only widened when they
+    # beat alpha. Scores are from the side to move's point of view, score is
+    # the packed evaluation deltaEval keeps up to date
+    def negamax(self, pos, depth, score, alpha, beta, ply=0, allowNull=True):
+
+        # Polls the clock every few nodes and abandons the search once out of time
+        self.nodes += 1
+        if not self.nodes % CHECK_EVERY and (time.perf_counter() >= self.deadline
+                                              or self.stopFlag is not None and self.stopFlag.is_set()):
+            raise SearchTimeout
+
+        # Draws by repetition, the fifty move rule or bare kings are neutral
+        if ply and pos.isDraw():
+            return 0
+
+        # Checks are searched a ply deeper so the horizon can't hide a mate or loss
+        inCheck = pos.inCheck()
+        if inCheck and self.useCheckExtension and ply < MAX_PLY:
+            depth += 1
+
+        # Reaches maximum depth, captures are played out until the position is quiet
+        if depth <= 0:
+            return self.quiesce(pos, score, alpha, beta, ply)
 
         # Gets current hash
-        key = self.computeZobristHash(board)
-
-        # Checks for transposition move
-        ttEntry = self.transpositionTable.get(key)
-        if ttEntry and ttEntry["depth"] >= depth:
-            return ttEntry["value"]
-        ttMove = ttEntry.get("move") if ttEntry else None
-
+        key = pos.key
+        alphaOrig = alpha
+        pvNode = beta - alpha > 1
+
+        # Checks for transposition move, bounds only cut when they fall outside the window
+        ttMove = 0
+        ttEntry = self.transpositionTable.probe(key)
+        self.ttProbes += 1
+        if ttEntry:
+            self.ttHits += 1
+            ttDepth, ttVal, ttBound, ttMove = ttEntry
+            if ttDepth >= depth:
+                ttVal = self.scoreFromTT(ttVal, ply)
+                if ttBound == EXACT or (ttBound == LOWER and ttVal >= beta) \
+                        or (ttBound == UPPER and ttVal <= alpha):
+                    self.ttCutoffs += 1
+                    return ttVal
+
+        # Null move: if passing still fails high the real moves surely would.
+        # Skipped in check, right after another null move and without pieces,
+        # where passing could be better than any move (zugzwang)
+        if self.useNullMove and allowNull and not pvNode and not inCheck and depth >= NULL_MIN_DEPTH \
+                and pos.hasPieces(pos.side) and sideScore(score, pos.side) >= beta:
+            reduction = NULL_REDUCTION + (depth >= 6)
+            pos.makeNull()
+            val = -self.negamax(pos, depth - 1 - reduction, score, -beta, -beta + 1, ply + 1, False)
+            pos.unmakeNull()
+            if val >= beta:
+                self.nullCutoffs += 1
+
+                # Mates found after passing aren't proven
+                return beta if val >= MATE_BOUND else val
+
+        # Main body of negamax
+        bestMove = 0
+        searched = 0
+        best = -float("inf")
+        killers = self.killers[ply] if ply < MAX_PLY else (0, 0)
+        for mv in self.pickMoves(pos, ttMove, ply):
+            quiet = not (mv >> 12 or pos.isCapture(mv))
+
+            # Incremental hash used to find next board value
+            nextScore = self.deltaEval(pos, mv, score)
+            if not pos.makeMove(mv):
+                continue
+            searched += 1
 
-        # Handles leaves in the tree
-        if board.is_game_over():                       
-            if board.is_checkmate():
-                # Each side prioritizes not getting checkmated and trying to checkmate
-                val = (1000000 - ply) if not maximizing else (-1000000 + ply)
+            if searched == 1:
+                val = -self.negamax(pos, depth - 1, nextScore, -beta, -alpha, ply + 1)
             else:
-                # Stalemate is neutral
-                val = 0
-            self.transpositionTable[key] = {"depth": depth, "value": val}
-            return val
-
-        # Reaches maximum depth
-        if depth == 0:                                
-            self.transpositionTable[key] = {"depth": depth, "value": score}
-            return score
-
+                # Late quiet moves are searched shallower, unless they give check
+                reduction = 0
+                if self.useLmr and quiet and depth >= LMR_MIN_DEPTH and searched > LMR_MIN_MOVES \
+                        and not inCheck and mv != killers[0] and mv != killers[1] and not pos.inCheck():
+                    reduction = min(1 if searched <= 2 * LMR_MIN_MOVES else 2, depth - 2)
+                    self.reductions += 1
+
+                # Zero window around alpha, re-searched at full depth and then
+                # with the full window when the move turns out better
+                window = alpha + 1 if self.usePvs else beta
+                val = -self.negamax(pos, depth - 1 - reduction, nextScore, -window, -alpha, ply + 1)
+                if reduction and val > alpha:
+                    self.researches += 1
+                    val = -self.negamax(pos, depth - 1, nextScore, -window, -alpha, ply + 1)
+                if self.usePvs and alpha < val < beta:
+                    self.researches += 1
+                    val = -self.negamax(pos, depth - 1, nextScore, -beta, -alpha, ply + 1)
+
+            # Removes last move
+            pos.unmakeMove()
+
+            if val > best:
+                best, bestMove = val, mv
+                if val > alpha:
+                    alpha = val
+                    if alpha >= beta:
+                        self.betaCutoffs += 1
+                        if searched == 1:
+                            self.firstMoveCutoffs += 1
+                        if quiet:
+                            self.updateQuietCutoff(pos, mv, depth, ply)
+                        break
+
+        # Handles leaves in the tree, checkmate or stalemate (neutral)
+        if not bestMove:
+            best = (-MATE + ply) if inCheck else 0
+
+        # Store calculated move in transposition table along with the kind of bound it is
+        if best <= alphaOrig:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.transpositionTable.store(key, depth, self.scoreToTT(best, ply), bound, bestMove)
+        return best
 
-        # Main body of minimax
-        bestMove = None                          
-        if maximizing:
+    # Searches captures only from the horizon, so the static score is never taken
+    # in the middle of an exchange. The side to move can stand pat on the static
+    # score, captures that lose material or can't reach alpha are skipped. In
+    # check every move is searched since standing pat isn't an option
+    def quiesce(self, pos, score, alpha, beta, ply):
+        self.qnodes += 1
+        if not self.qnodes % CHECK_EVERY and (time.perf_counter() >= self.deadline
+                                               or self.stopFlag is not None and self.stopFlag.is_set()):
+            raise SearchTimeout
+
+        # Static score for the side to move
+        standPat = sideScore(score, pos.side)
+        if ply >= 2 * MAX_PLY:
+            return standPat
+
+        inCheck = pos.inCheck()
+        if inCheck:
             best = -float("inf")
-            for mv in self.orderMoves(board, ttMove):      
-
-                # Incremental hash used to find next board value
-                nextScore = self.deltaEval(board, mv, score)
-                board.push(mv)
-
-                # Recurses to try next board
-                val = self.minimax(board, depth-1, nextScore, alpha, beta, False, ply+1)
-
-                # Removes last move
-                board.pop()
-                if val > best:
-                    best, bestMove = val, mv
-
-                # Checks to see if pruning is possible
-                alpha = max(alpha, best)
-                if beta <= alpha:
-                    break
+            moves = self.pickMoves(pos, 0, ply)
         else:
-            # Similar idea to max, but tries to minimize the possible score
-            # to represent the oponent mimizing computer score
-            best = float("inf")
-            for mv in self.orderMoves(board, ttMove):      
-                nextScore = self.deltaEval(board, mv, score)
-                board.push(mv)
-                val = self.minimax(board, depth-1, nextScore, alpha, beta, True, ply+1)
-                board.pop()
-                if val < best:
-                    best, bestMove = val, mv
-                beta = min(beta, best)
-                if beta <= alpha:
-                    break
-
-        # Store calculated move in transposition table
-        self.transpositionTable[key] = {"depth": depth, "value": best, "move": bestMove}
+            # Stand pat, the side to move isn't forced to capture
+            best = standPat
+            if best >= beta:
+                return best
+            alpha = max(alpha, best)
+            moves = self.orderCaptures(pos)
+
+        board = pos.board
+        pieceValues = self.pieceValues
+        played = False
+        for mv in moves:
+            if not inCheck:
+                # Delta pruning, even winning the piece outright can't matter
+                to = (mv >> 6) & 63
+                gain = pieceValues[board[to] & 7] if board[to] else pieceValues[chess.PAWN] * (to == pos.ep)
+                if mv >> 12:
+                    gain += pieceValues[mv >> 12] - pieceValues[chess.PAWN]
+                if standPat + gain + DELTA_MARGIN <= alpha:
+                    continue
+
+                # Only captures that don't lose material in the exchange are searched
+                if pieceValues[board[mv & 63] & 7] > gain and pos.see(mv) < 0:
+                    continue
+
+            nextScore = self.deltaEval(pos, mv, score)
+            if not pos.makeMove(mv):
+                continue
+            played = True
+            val = -self.quiesce(pos, nextScore, -beta, -alpha, ply + 1)
+            pos.unmakeMove()
+
+            if val > best:
+                best = val
+                if val > alpha:
+                    alpha = val
+                    if alpha >= beta:
+                        break
+
+        # Checkmated, nothing got the king out of check
+        if inCheck and not played:
+            return -MATE + ply
         return best
 
+    # Follows the hash table moves after firstMove to rebuild the principal variation
+    def principalVariation(self, pos: Position, firstMove, maxLength=MAX_PLY):
+        pv = []
+        seen = set()
+        move = firstMove
+        while move and len(pv) < maxLength and pos.key not in seen:
+            seen.add(pos.key)
+            if not pos.isPseudoLegal(move) or not pos.makeMove(move):
+                break
+            pv.append(move)
+            entry = self.transpositionTable.probe(pos.key)
+            move = entry[3] if entry else 0
+        for _ in pv:
+            pos.unmakeMove()
+        return pv
+
+    # Checks a pseudo-legal move without leaving it on the board
+    def isLegal(self, pos, move):
+        if pos.makeMove(move):
+            pos.unmakeMove()
+            return True
+        return False
+
+
+    # Searches for the best move in a current position. With timeLeft
+    # and increment the budget comes from the clock, maxTime caps it when
+    # given, and without either the move gets DEFAULT_MOVE_TIME seconds.
+    # maxDepth stops after that many plies (pass maxTime=float("inf") for a
+    # purely fixed depth search). onIteration is called with each completed
+    # depth's stats, profiler is any context manager (e.g. cProfile.Profile())
+    # wrapped around the search, and returnInfo returns (move, info) instead
+    # of just the move
+    def findBestMove(self, board: chess.Board, maxTime: float = None,
+                     timeLeft: float = None, increment: float = 0.0, maxDepth: int = None,
+                     onIteration=None, profiler=None, returnInfo=False):
+        start = time.perf_counter()
+        move = self.chooseMove(board, maxTime, timeLeft, increment, maxDepth, onIteration, profiler)
+
+        elapsed = time.perf_counter() - start
+        self.lastInfo = {
+            "bestMove": move.uci() if move else None,
+            "book": self.searchSource == "book",
+            "cached": self.searchSource == "cache",
+            "depth": self.searchDepth,
+            "score": self.searchScore,
+            "pv": self.searchPv,
+            "nodes": self.nodes,
+            "qnodes": self.qnodes,
+            "time": round(elapsed, 4),
+            "nps": int((self.nodes + self.qnodes) / elapsed) if elapsed else 0,
+            "ttProbes": self.ttProbes,
+            "ttHits": self.ttHits,
+            "ttCutoffs": self.ttCutoffs,
+            "betaCutoffs": self.betaCutoffs,
+            "firstMoveCutoffs": self.firstMoveCutoffs,
+            "nullCutoffs": self.nullCutoffs,
+            "reductions": self.reductions,
+            "researches": self.researches,
+            "aspirationFails": self.aspirationFails,
+            "aborted": self.aborted,
+            "iterations": self.iterations,
+        }
+        return (move, self.lastInfo) if returnInfo else move
 
-    # Uses minimax to find the best move in a current position
-    def findBestMove(self, board: chess.Board, maxTime: float = 2.0):
+    # Book, then result cache, then search
+    def chooseMove(self, board, maxTime, timeLeft, increment, maxDepth, onIteration, profiler):
 
         # Checks for book move
+        self.resetCounters()
+        self.searchDepth, self.searchScore, self.searchPv = 0, None, []
+        self.searchSource = "book"
         bm = self.bookMove(board)
         if bm:
+            self.searchPv = [bm.uci()]
             return bm
 
+        # Serves repeated positions from the result cache when it's deep enough,
+        # the engine's depth is the requirement for searches without a fixed one
+        self.searchSource = "cache"
+        if self.cache is not None:
+            cached = self.cache.get(board, maxDepth or self.depth)
+            if cached:
+                self.searchDepth, self.searchScore, self.searchPv = cached["depth"], cached["score"], cached["pv"]
+                return chess.Move.from_uci(cached["move"])
+
+        self.searchSource = "search"
+        timer = TimeManager(maxTime, timeLeft, increment)
+
+        # Entries from earlier moves stay, but get replaced first
+        self.transpositionTable.newSearch()
+
+        # Helper processes search the same root and fill the shared table meanwhile
+        if self.smp:
+            self.smp.start(board.fen(), self.transpositionTable.age, timer.deadline)
+
+        pos = self.newPosition(board)
+        with profiler if profiler is not None else contextlib.nullcontext():
+            bestMove, depth, score = self.search(pos, self.fullEvaluate(board), timer,
+                                                 maxDepth=maxDepth, onIteration=onIteration)
+
+        # Takes the deepest completed result, the main search wins ties
+        if self.smp:
+            for helperMove, helperDepth, helperScore, helperNodes, helperQnodes in self.smp.collect():
+                self.nodes += helperNodes
+                self.qnodes += helperQnodes
+                if helperMove and helperDepth > depth:
+                    bestMove, depth, score = helperMove, helperDepth, helperScore
+        self.searchDepth = depth
+        self.searchScore = score if depth else None
+        self.searchPv = [self.decodeMove(mv).uci() for mv in self.principalVariation(pos, bestMove)]
+
+        if self.cache is not None and bestMove and depth:
+            self.cache.put(board, self.decodeMove(bestMove).uci(), score, depth, self.searchPv)
+
+        return self.decodeMove(bestMove)
+
+    # Iterative deepening until the timer says stop. Returns the best packed
+    # move, the last completed depth and its score
+    def search(self, pos: Position, rootEval, timer: TimeManager, startDepth=1, maxDepth=None,
+               onIteration=None):
+
         # Constants
-        start    = time.perf_counter()
-        rootEval = self.fullEvaluate(board)
-        depth    = 1
-        bestMove = None                      
-
-        # Iterates deeper until time limit is exceeded by last layer
-        while True:
-            if time.perf_counter() - start >= maxTime:
-                break                       
-
-            self.transpositionTable.clear()  
-
-            # Values for alpha beta pruning
-            bestVal  = -float("inf")
-            alpha, beta = -float("inf"), float("inf")
-
-            # Starts the recursive process
-            for mv in self.orderMoves(board):           
-                scoreAfter = self.deltaEval(board, mv, rootEval)
-                board.push(mv)
-                val = self.minimax(board, depth - 1, scoreAfter,
-                                alpha, beta, False)
-                board.pop()
-
-                if val > bestVal:                       
-                    bestVal, bestMove = val, mv
-                alpha = max(alpha, bestVal)
-
-            depth += 1                                  
-        print(depth)
-        
-        return bestMove
+        depth    = startDepth
+        bestMove = 0
+        bestVal  = 0
+        rootKey  = pos.key
+        stable   = 0
+        completed = 0
+        self.resetCounters()
+
+        # Killers are tied to the old root, history is kept but faded
+        self.killers = [[0, 0] for _ in range(MAX_PLY)]
+        for side in self.history:
+            for i in range(4096):
+                side[i] >>= 2
+        self.deadline = timer.deadline
+
+        rootPly  = len(pos.stack)
+
+        # Falls back on the first ordered legal move if not even depth 1 finishes
+        ttEntry = self.transpositionTable.probe(rootKey)
+        rootMoves = [mv for mv in self.orderMoves(pos, ttEntry[3] if ttEntry else 0)
+                     if self.isLegal(pos, mv)]
+        if not rootMoves:
+            return None, 0, 0
+        fallback = rootMoves[0]
+
+        # Every line from a dead drawn root ends at once, deeper searches can't change it
+        deadDraw = pos.isDraw()
+
+        # Iterates deeper until the time manager says stop, never past MAX_PLY
+        lastDepth = MAX_PLY if maxDepth is None else min(maxDepth, MAX_PLY)
+        while depth <= lastDepth and not timer.shouldStop(stable):
+
+            # Searches a window around the last score first, widening the side
+            # that fails until the score lands inside
+            window = ASPIRATION_WINDOW
+            if self.useAspiration and completed and abs(bestVal) < MATE_BOUND:
+                alpha, beta = bestVal - window, bestVal + window
+            else:
+                alpha, beta = -float("inf"), float("inf")
+
+            firstMove = bestMove or fallback
+            try:
+                while True:
+                    iterVal, iterMove = self.searchRoot(pos, rootEval, depth, alpha, beta, firstMove)
+                    if iterVal <= alpha and alpha > -float("inf"):
+                        window *= 4
+                        alpha = bestVal - window if window < ASPIRATION_MAX else -float("inf")
+                    elif iterVal >= beta and beta < float("inf"):
+                        # The move that failed high goes first in the wider search
+                        firstMove = iterMove
+                        window *= 4
+                        beta = bestVal + window if window < ASPIRATION_MAX else float("inf")
+                    else:
+                        break
+                    self.aspirationFails += 1
+            except SearchTimeout:
+                # Takes back the moves the aborted search left on the board
+                pos.unwind(rootPly)
+
+                # The previous best is searched first, so anything that beat it
+                # in the partial iteration is at least as good
+                if self.rootMove:
+                    bestMove = self.rootMove
+                self.aborted = True
+                break
+
+            stable = stable + 1 if iterMove == bestMove else 0
+            bestMove, bestVal, completed = iterMove, iterVal, depth
+            record = {
+                "depth": depth,
+                "score": bestVal,
+                "pv": [self.decodeMove(mv).uci() for mv in self.principalVariation(pos, bestMove)],
+                "nodes": self.nodes,
+                "qnodes": self.qnodes,
+                "time": round(timer.elapsed(), 4),
+                "ttProbes": self.ttProbes,
+                "ttHits": self.ttHits,
+                "betaCutoffs": self.betaCutoffs,
+            }
+            self.iterations.append(record)
+            if onIteration is not None:
+                onIteration(record)
+            self.transpositionTable.store(rootKey, depth, self.scoreToTT(bestVal, 0), EXACT, bestMove)
+
+            # Stops once the result is proven, a draw or a mate inside the searched depth
+            if deadDraw or (abs(bestVal) >= MATE_BOUND and MATE - abs(bestVal) <= depth):
+                break
+            depth += 1
+
+        self.deadline = float("inf")
+        return bestMove or fallback, completed, bestVal
+
+    # One pass over the root moves at a fixed depth and window, the previous
+    # best move first. The best move so far is kept in rootMove so an aborted
+    # pass can still use it, moves only replace it by beating alpha
+    def searchRoot(self, pos: Position, rootEval, depth, alpha, beta, firstMove):
+        best = -float("inf")
+        self.rootMove = 0
+        searched = 0
+        for mv in self.orderMoves(pos, firstMove):
+            scoreAfter = self.deltaEval(pos, mv, rootEval)
+            if not pos.makeMove(mv):
+                continue
+            searched += 1
+            if searched == 1 or not self.usePvs:
+                val = -self.negamax(pos, depth - 1, scoreAfter, -beta, -alpha, 1)
+            else:
+                val = -self.negamax(pos, depth - 1, scoreAfter, -alpha - 1, -alpha, 1)
+                if alpha < val < beta:
+                    self.researches += 1
+                    val = -self.negamax(pos, depth - 1, scoreAfter, -beta, -alpha, 1)
+            pos.unmakeMove()
+
+            if val > best:
+                best = val
+                if val > alpha or not self.rootMove:
+                    self.rootMove = mv
+                if val > alpha:
+                    alpha = val
+                    if alpha >= beta:
+                        break
+        return best, self.rootMove
@@ -0,0 +1,193 @@
+import itertools
+import math
+import multiprocessing as mp
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import chess
+
+from timeman import TimeManager
+
+# Processes are spawned so they're safe to start from the threaded server
+context = mp.get_context("spawn")
+
+
+# Raised when the worker a request would go to already has a full queue
+class PoolBusy(Exception):
+
+    def __init__(self, retryAfter):
+        super().__init__(f"engine pool is busy, retry in {retryAfter}s")
+        self.retryAfter = retryAfter
+
+
+# Runs in each worker process. Keeps one ChessEngine per game so follow-up
+# requests find their warm hash table, plus a shared one for requests
+# without a game id. Past maxSessions games the least recently used one is
+# dropped, so memory per worker stays bounded
+def workerMain(requests, results, ttMb, sessionTtMb, bookPath, cachePath, maxSessions):
+    from chess_engine import ChessEngine
+    from resultcache import ResultCache
+
+    # One result cache per process, the sqlite file behind it is shared by all workers
+    cache = ResultCache(cachePath)
+    default = ChessEngine(bookPath=bookPath, tt_mb=ttMb, cache=cache)
+    engines = OrderedDict()
+    while True:
+        msg = requests.get()
+        if msg is None:
+            break
+
+        kind, *args = msg
+        if kind == "evict":
+            engines.pop(args[0], None)
+            continue
+
+        requestId, sessionId, fen, params = args
+
+        # Streamed requests get each completed depth as an "info" message
+        if params.pop("stream", False):
+            params["onIteration"] = lambda record: results.put((requestId, "info", record))
+        try:
+            if sessionId is None:
+                engine = default
+            else:
+                engine = engines.get(sessionId)
+                if engine is None:
+                    if len(engines) >= maxSessions:
+                        engines.popitem(last=False)
+                    engine = engines[sessionId] = ChessEngine(bookPath=bookPath, tt_mb=sessionTtMb, cache=cache)
+                engines.move_to_end(sessionId)
+
+            _, info = engine.findBestMove(chess.Board(fen), returnInfo=True, **params)
+            results.put((requestId, "result", info))
+        except Exception as e:
+            results.put((requestId, "error", f"{type(e).__name__}: {e}"))
+
+
+class EnginePool:
+
+    # Starts one process per worker. Each worker has its own bounded queue,
+    # games stick to the worker that first served them and are dropped after
+    # idleTimeout seconds without a request, or sooner once a worker holds
+    # maxSessions games. cachePath adds an on-disk result cache shared by the
+    # workers
+    def __init__(self, workers=None, maxQueue=4, idleTimeout=600.0,
+                 ttMb=16, sessionTtMb=8, bookPath="Perfect2023.bin", cachePath=None, maxSessions=32):
+        self.maxQueue = maxQueue
+        self.idleTimeout = idleTimeout
+        self.results = context.Queue()
+        self.queues = []
+        self.processes = []
+        for _ in range(workers or mp.cpu_count()):
+            requests = context.Queue()
+            proc = context.Process(target=workerMain, daemon=True,
+                                   args=(requests, self.results, ttMb, sessionTtMb, bookPath, cachePath,
+                                         maxSessions))
+            proc.start()
+            self.queues.append(requests)
+            self.processes.append(proc)
+
+        # Requests queued or running on each worker, and game id -> [worker, last seen]
+        self.lock = threading.Lock()
+        self.load = [0] * len(self.processes)
+        self.sessions = {}
+        self.pending = {}
+        self.requestIds = itertools.count()
+        self.closed = False
+
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+        self.evictor = threading.Thread(target=self.evictIdle, daemon=True)
+        self.evictor.start()
+
+    # Hands each worker message to the request waiting for it
+    def dispatch(self):
+        while True:
+            msg = self.results.get()
+            if msg is None:
+                break
+            requestId, kind, payload = msg
+            with self.lock:
+                if kind == "info":
+                    entry = self.pending.get(requestId)
+                else:
+                    entry = self.pending.pop(requestId, None)
+                    if entry is not None:
+                        self.load[entry[1]] -= 1
+            # Requests that timed out still hold their slot until now, their answer is dropped
+            if entry is not None and entry[0] is not None:
+                entry[0].put((kind, payload))
+
+    # Drops games that haven't sent a request in a while, freeing their engines
+    def evictIdle(self):
+        while not self.closed:
+            time.sleep(max(1.0, self.idleTimeout / 4))
+            cutoff = time.monotonic() - self.idleTimeout
+            with self.lock:
+                idle = [sid for sid, (_, seen) in self.sessions.items() if seen < cutoff]
+                for sid in idle:
+                    worker, _ = self.sessions.pop(sid)
+                    self.queues[worker].put(("evict", sid))
+
+    # Picks the game's worker, or the least loaded one for new games
+    def assign(self, sessionId):
+        if sessionId is not None and sessionId in self.sessions:
+            worker = self.sessions[sessionId][0]
+        else:
+            worker = min(range(len(self.load)), key=self.load.__getitem__)
+        if sessionId is not None:
+            self.sessions[sessionId] = [worker, time.monotonic()]
+        return worker
+
+    # Searches a position on a worker and waits for the result, the engine's
+    # info dict. onIteration gets each completed depth as it arrives. Raises
+    # PoolBusy when that worker's queue is full and TimeoutError if no answer
+    # comes back
+    def bestMove(self, fen, sessionId=None, maxTime=None, timeLeft=None, increment=0.0, onIteration=None):
+        params = {"maxTime": maxTime, "timeLeft": timeLeft, "increment": increment,
+                  "stream": onIteration is not None}
+
+        # Longest the search can take, for Retry-After and the answer timeout
+        budget = TimeManager(maxTime, timeLeft, increment).hard
+        waiter = queue.Queue()
+        with self.lock:
+            worker = self.assign(sessionId)
+            if self.load[worker] >= self.maxQueue:
+                raise PoolBusy(max(1, math.ceil(self.load[worker] * budget)))
+            requestId = next(self.requestIds)
+            self.pending[requestId] = (waiter, worker)
+            self.load[worker] += 1
+
+        self.queues[worker].put(("search", requestId, sessionId, fen, params))
+
+        # Everything queued ahead of this request has to finish first
+        deadline = time.monotonic() + (self.maxQueue + 1) * budget + 10
+        while True:
+            try:
+                kind, payload = waiter.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                # The worker is still busy with it, so the request keeps counting
+                # against the queue until its answer arrives
+                with self.lock:
+                    if requestId in self.pending:
+                        self.pending[requestId] = (None, worker)
+                raise TimeoutError("engine worker did not answer")
+            if kind != "info":
+                break
+            onIteration(payload)
+        if kind == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def close(self):
+        self.closed = True
+        for requests in self.queues:
+            requests.put(None)
+        for proc in self.processes:
+            proc.join(timeout=1.0)
+            if proc.is_alive():
+                proc.terminate()
+        self.results.put(None)
+        self.dispatcher.join(timeout=1.0)
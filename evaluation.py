@@ -0,0 +1,225 @@
+import chess
+
+from position import PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, WHITE, WHITE_BIT
+
+# NumPy is only needed for batch scoring
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Midgame piece square tables, laid out as seen from White with rank 8 first
+king_mid = [0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, -5, -5, -5, 0, 0,
+            0, 0, 10, -5, -5, -5, 10, 0]
+
+queen_mid = [-20, -10, -10, -5, -5, -10, -10, -20,
+             -10, 0, 0, 0, 0, 0, 0, -10,
+             -10, 0, 5, 5, 5, 5, 0, -10,
+             -5, 0, 5, 5, 5, 5, 0, -5,
+             -5, 0, 5, 5, 5, 5, 0, -5,
+             -10, 5, 5, 5, 5, 5, 0, -10,
+             -10, 0, 5, 0, 0, 0, 0, -10,
+             -20, -10, -10, 0, 0, -10, -10, -20]
+
+rook_mid = [10, 10, 10, 10, 10, 10, 10, 10,
+            10, 10, 10, 10, 10, 10, 10, 10,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 10, 10, 0, 0, 0,
+            0, 0, 0, 10, 10, 5, 0, 0]
+
+bishop_mid = [0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0,
+              0, 0, 0, 0, 0, 0, 0, 0,
+              0, 10, 0, 0, 0, 0, 10, 0,
+              5, 0, 10, 0, 0, 10, 0, 5,
+              0, 10, 0, 10, 10, 0, 10, 0,
+              0, 10, 0, 10, 10, 0, 10, 0,
+              0, 0, -10, 0, 0, -10, 0, 0]
+
+knight_mid = [-5, -5, -5, -5, -5, -5, -5, -5,
+              -5, 0, 0, 10, 10, 0, 0, -5,
+              -5, 5, 10, 10, 10, 10, 5, -5,
+              -5, 5, 10, 15, 15, 10, 5, -5,
+              -5, 5, 10, 15, 15, 10, 5, -5,
+              -5, 5, 10, 10, 10, 10, 5, -5,
+              -5, 0, 0, 5, 5, 0, 0, -5,
+              -5, -10, -5, -5, -5, -5, -10, -5]
+
+pawn_mid = [0, 0, 0, 0, 0, 0, 0, 0,
+            30, 30, 30, 40, 40, 30, 30, 30,
+            20, 20, 20, 30, 30, 30, 20, 20,
+            10, 10, 15, 25, 25, 15, 10, 10,
+            5, 5, 5, 20, 20, 5, 5, 5,
+            5, 0, 0, 5, 5, 0, 0, 5,
+            5, 5, 5, -10, -10, 5, 5, 5,
+            0, 0, 0, 0, 0, 0, 0, 0]
+
+# Endgame tables, the king heads for the centre and passed pawns for promotion
+king_end = [-50, -30, -30, -30, -30, -30, -30, -50,
+            -30, -20, -10, 0, 0, -10, -20, -30,
+            -30, -10, 20, 30, 30, 20, -10, -30,
+            -30, -10, 30, 40, 40, 30, -10, -30,
+            -30, -10, 30, 40, 40, 30, -10, -30,
+            -30, -10, 20, 30, 30, 20, -10, -30,
+            -30, -30, 0, 0, 0, 0, -30, -30,
+            -50, -30, -30, -30, -30, -30, -30, -50]
+
+pawn_end = [0, 0, 0, 0, 0, 0, 0, 0,
+            80, 80, 80, 80, 80, 80, 80, 80,
+            50, 50, 50, 50, 50, 50, 50, 50,
+            30, 30, 30, 30, 30, 30, 30, 30,
+            20, 20, 20, 20, 20, 20, 20, 20,
+            10, 10, 10, 10, 10, 10, 10, 10,
+            10, 10, 10, 10, 10, 10, 10, 10,
+            0, 0, 0, 0, 0, 0, 0, 0]
+
+# The other pieces keep their midgame tables
+queen_end = queen_mid
+rook_end = rook_mid
+bishop_end = bishop_mid
+knight_end = knight_mid
+
+MIDGAME_TABLES = {PAWN: pawn_mid, KNIGHT: knight_mid, BISHOP: bishop_mid,
+                  ROOK: rook_mid, QUEEN: queen_mid, KING: king_mid}
+ENDGAME_TABLES = {PAWN: pawn_end, KNIGHT: knight_end, BISHOP: bishop_end,
+                  ROOK: rook_end, QUEEN: queen_end, KING: king_end}
+
+# Material by piece type, pawns gain and minor pieces lose value as pieces come off
+MIDGAME_VALUES = [0, 100, 320, 330, 500, 900, 0]
+ENDGAME_VALUES = [0, 120, 300, 320, 520, 920, 0]
+
+# Game phase is the non-pawn material left, PHASE_TOTAL at the start and 0 in
+# a pawn ending
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]
+PHASE_TOTAL = 24
+
+# Per-square values indexed by mailbox code * 64 + square, positive for White
+# and negative for Black, with the tables already flipped for each color
+MIDGAME = [0] * (16 * 64)
+ENDGAME = [0] * (16 * 64)
+PHASE = [0] * (16 * 64)
+for pieceType in range(PAWN, KING + 1):
+    for color in (WHITE, 1 - WHITE):
+        code = pieceType | (WHITE_BIT if color == WHITE else 0)
+        sign = 1 if color == WHITE else -1
+        for sq in range(64):
+            idx = sq ^ 56 if color == WHITE else sq
+            MIDGAME[code * 64 + sq] = sign * (MIDGAME_VALUES[pieceType] + MIDGAME_TABLES[pieceType][idx])
+            ENDGAME[code * 64 + sq] = sign * (ENDGAME_VALUES[pieceType] + ENDGAME_TABLES[pieceType][idx])
+            PHASE[code * 64 + sq] = PHASE_WEIGHTS[pieceType]
+
+# The search passes one int down the tree holding the midgame score in the low
+# bits, the endgame score above it and the phase on top. Packed values add up
+# field by field, so a move's effect on all three is one addition
+SHIFT = 1 << 20
+HALF = SHIFT >> 1
+
+
+def pack(mg, eg, phase=0):
+    return mg + eg * SHIFT + phase * SHIFT * SHIFT
+
+
+def unpack(packed):
+    mg = (packed + HALF) % SHIFT - HALF
+    packed = (packed - mg) // SHIFT
+    eg = (packed + HALF) % SHIFT - HALF
+    return mg, eg, (packed - eg) // SHIFT
+
+
+PSQ = [pack(mg, eg, phase) for mg, eg, phase in zip(MIDGAME, ENDGAME, PHASE)]
+
+if np is not None:
+    MIDGAME_ARRAY = np.array(MIDGAME, dtype=np.int32).reshape(16, 64)
+    ENDGAME_ARRAY = np.array(ENDGAME, dtype=np.int32).reshape(16, 64)
+    PHASE_ARRAY = np.array(PHASE[::64], dtype=np.int32)
+
+
+# Blends the midgame and endgame scores by phase, from White's point of view.
+# Rounds toward zero so a position and its colour mirror score the same
+def taper(packed):
+    mg, eg, phase = unpack(packed)
+    phase = min(phase, PHASE_TOTAL)
+    score = mg * phase + eg * (PHASE_TOTAL - phase)
+    return score // PHASE_TOTAL if score >= 0 else -(-score // PHASE_TOTAL)
+
+
+# Tapered score from the given side's point of view, called at every leaf
+def sideScore(packed, side):
+    score = taper(packed)
+    return score if side == WHITE else -score
+
+
+# Packed score of a chess.Board, walking each piece bitboard
+def boardScore(board: chess.Board):
+    total = 0
+    for color in (chess.WHITE, chess.BLACK):
+        colorBit = WHITE_BIT if color else 0
+        for pieceType in range(PAWN, KING + 1):
+            base = (pieceType | colorBit) * 64
+            bb = board.pieces_mask(pieceType, color)
+            while bb:
+                low = bb & -bb
+                total += PSQ[base + low.bit_length() - 1]
+                bb ^= low
+    return total
+
+
+# Centipawn score of a chess.Board for the side to move
+def evaluate(board: chess.Board):
+    return sideScore(boardScore(board), WHITE if board.turn else 1 - WHITE)
+
+
+FEN_CODES = {symbol: chess.Piece.from_symbol(symbol).piece_type
+             | (WHITE_BIT if symbol.isupper() else 0) for symbol in "PNBRQKpnbrqk"}
+
+
+# Turns FENs or chess.Boards into an (n, 64) array of mailbox codes and an
+# array of sides to move, the input evaluateBatch and tuning scripts work on
+def encodeBatch(positions):
+    if np is None:
+        raise ImportError("batch scoring needs numpy, pip install numpy")
+    positions = list(positions)
+    codes = np.zeros((len(positions), 64), dtype=np.uint8)
+    sides = np.zeros(len(positions), dtype=np.int8)
+    for i, position in enumerate(positions):
+        row = codes[i]
+        if isinstance(position, chess.BaseBoard):
+            for sq, piece in position.piece_map().items():
+                row[sq] = piece.piece_type | (WHITE_BIT if piece.color else 0)
+            sides[i] = WHITE if getattr(position, "turn", chess.WHITE) else 1 - WHITE
+            continue
+
+        # FEN placement is read directly, building boards would dominate the time
+        fields = position.split()
+        for rank, text in enumerate(fields[0].split("/")):
+            sq = (7 - rank) * 8
+            for symbol in text:
+                if symbol.isdigit():
+                    sq += int(symbol)
+                else:
+                    row[sq] = FEN_CODES[symbol]
+                    sq += 1
+        sides[i] = WHITE if len(fields) < 2 or fields[1] == "w" else 1 - WHITE
+    return codes, sides
+
+
+# Scores many positions at once, for the side to move of each. Gives the same
+# numbers as evaluate, as an int array
+def evaluateBatch(positions):
+    codes, sides = encodeBatch(positions)
+    squares = np.arange(64)
+    mg = MIDGAME_ARRAY[codes, squares].sum(axis=1, dtype=np.int64)
+    eg = ENDGAME_ARRAY[codes, squares].sum(axis=1, dtype=np.int64)
+    phase = np.minimum(PHASE_ARRAY[codes].sum(axis=1, dtype=np.int64), PHASE_TOTAL)
+    scores = mg * phase + eg * (PHASE_TOTAL - phase)
+    scores = np.sign(scores) * (np.abs(scores) // PHASE_TOTAL)
+    return np.where(sides == WHITE, scores, -scores)
@@ -0,0 +1,594 @@
+import chess
+
+# Piece codes used in the mailbox, piece type plus 8 for white pieces
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+WHITE, BLACK = 1, 0
+WHITE_BIT = 8
+
+# Castling right bits
+WHITE_OO, WHITE_OOO, BLACK_OO, BLACK_OOO = 1, 2, 4, 8
+
+# Rights that survive a piece moving from or to each square
+CASTLE_MASK = [15] * 64
+CASTLE_MASK[chess.E1] = 15 & ~(WHITE_OO | WHITE_OOO)
+CASTLE_MASK[chess.H1] = 15 & ~WHITE_OO
+CASTLE_MASK[chess.A1] = 15 & ~WHITE_OOO
+CASTLE_MASK[chess.E8] = 15 & ~(BLACK_OO | BLACK_OOO)
+CASTLE_MASK[chess.H8] = 15 & ~BLACK_OO
+CASTLE_MASK[chess.A8] = 15 & ~BLACK_OOO
+
+# Rook jumps for each castling king destination
+CASTLE_ROOK = {
+    chess.G1: (chess.H1, chess.F1),
+    chess.C1: (chess.A1, chess.D1),
+    chess.G8: (chess.H8, chess.F8),
+    chess.C8: (chess.A8, chess.D8),
+}
+
+# Single bit for each square
+BB = [1 << sq for sq in range(64)]
+
+
+# Builds a jump attack table from (file, rank) offsets
+def jumpAttacks(offsets):
+    table = []
+    for sq in range(64):
+        f, r = sq & 7, sq >> 3
+        bb = 0
+        for df, dr in offsets:
+            if 0 <= f + df < 8 and 0 <= r + dr < 8:
+                bb |= BB[(r + dr) * 8 + f + df]
+        table.append(bb)
+    return table
+
+
+# Builds the list of squares walked from each square in each direction
+def slideRays(directions):
+    table = []
+    for sq in range(64):
+        rays = []
+        for df, dr in directions:
+            ray = []
+            f, r = (sq & 7) + df, (sq >> 3) + dr
+            while 0 <= f < 8 and 0 <= r < 8:
+                ray.append(r * 8 + f)
+                f, r = f + df, r + dr
+            if ray:
+                rays.append(ray)
+        table.append(rays)
+    return table
+
+
+KNIGHT_ATTACKS = jumpAttacks([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = jumpAttacks([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+
+# Squares a pawn of each color attacks, indexed [color][square]
+PAWN_ATTACKS = [jumpAttacks([(-1, -1), (1, -1)]), jumpAttacks([(-1, 1), (1, 1)])]
+
+ROOK_RAYS = slideRays([(1, 0), (-1, 0), (0, 1), (0, -1)])
+BISHOP_RAYS = slideRays([(1, 1), (1, -1), (-1, 1), (-1, -1)])
+
+# Every square on a piece's lines, used to skip ray walks that can't hit anything
+ROOK_LINES = [sum(BB[t] for ray in rays for t in ray) for rays in ROOK_RAYS]
+BISHOP_LINES = [sum(BB[t] for ray in rays for t in ray) for rays in BISHOP_RAYS]
+
+# Squares strictly between two squares on a shared line, indexed [from * 64 + to]
+BETWEEN = [0] * 4096
+for sq in range(64):
+    for ray in ROOK_RAYS[sq] + BISHOP_RAYS[sq]:
+        passed = 0
+        for t in ray:
+            BETWEEN[sq * 64 + t] = passed
+            passed |= BB[t]
+
+PROMOTIONS = (QUEEN, KNIGHT, ROOK, BISHOP)
+
+# Piece values used by static exchange evaluation, the king can't be traded
+SEE_VALUES = [0, 100, 320, 330, 500, 900, 20000]
+
+
+# Position used inside the search, only converted to and from chess.Board at the root
+class Position:
+
+    # Copies a chess.Board into bitboards and a mailbox array
+    def __init__(self, board: chess.Board, pieceKeys, sideKey, castleKeys, epKeys):
+        self.pieceKeys = pieceKeys
+        self.sideKey = sideKey
+        self.castleKeys = castleKeys
+        self.epKeys = epKeys
+
+        self.board = [0] * 64
+        self.pieces = [0] * 16
+        self.occ = [0, 0]
+        self.kingSq = [0, 0]
+        for sq, piece in board.piece_map().items():
+            code = piece.piece_type | (WHITE_BIT if piece.color else 0)
+            self.board[sq] = code
+            self.pieces[code] |= BB[sq]
+            self.occ[piece.color] |= BB[sq]
+            if piece.piece_type == KING:
+                self.kingSq[piece.color] = sq
+
+        self.side = WHITE if board.turn else BLACK
+        self.castling = (
+            (WHITE_OO if board.has_kingside_castling_rights(chess.WHITE) else 0)
+            | (WHITE_OOO if board.has_queenside_castling_rights(chess.WHITE) else 0)
+            | (BLACK_OO if board.has_kingside_castling_rights(chess.BLACK) else 0)
+            | (BLACK_OOO if board.has_queenside_castling_rights(chess.BLACK) else 0)
+        )
+        self.ep = board.ep_square if board.ep_square is not None else -1
+        self.halfmove = board.halfmove_clock
+
+        self.key = self.computeKey()
+        self.history = [self.key]
+        self.stack = []
+
+    # Full zobrist rebuild, only needed when the position is set up
+    def computeKey(self):
+        key = 0
+        for sq in range(64):
+            if self.board[sq]:
+                key ^= self.pieceKeys[self.board[sq] * 64 + sq]
+        if self.side == BLACK:
+            key ^= self.sideKey
+        key ^= self.castleKeys[self.castling]
+        if self.ep >= 0:
+            key ^= self.epKeys[self.ep & 7]
+        return key
+
+    # Checks if a square is attacked by the given color
+    def isAttacked(self, sq, byColor):
+        pieces = self.pieces
+        colorBit = WHITE_BIT if byColor else 0
+
+        if PAWN_ATTACKS[byColor ^ 1][sq] & pieces[PAWN | colorBit]:
+            return True
+        if KNIGHT_ATTACKS[sq] & pieces[KNIGHT | colorBit]:
+            return True
+        if KING_ATTACKS[sq] & pieces[KING | colorBit]:
+            return True
+
+        board = self.board
+        queen = QUEEN | colorBit
+        rook = ROOK | colorBit
+        if ROOK_LINES[sq] & (pieces[rook] | pieces[queen]):
+            for ray in ROOK_RAYS[sq]:
+                for t in ray:
+                    p = board[t]
+                    if p:
+                        if p == rook or p == queen:
+                            return True
+                        break
+        bishop = BISHOP | colorBit
+        if BISHOP_LINES[sq] & (pieces[bishop] | pieces[queen]):
+            for ray in BISHOP_RAYS[sq]:
+                for t in ray:
+                    p = board[t]
+                    if p:
+                        if p == bishop or p == queen:
+                            return True
+                        break
+        return False
+
+    # Every piece of the given color attacking a square, with sliders seen
+    # through the given occupancy so x-rays show up once pieces are removed
+    def attackersTo(self, sq, byColor, occupied):
+        pieces = self.pieces
+        colorBit = WHITE_BIT if byColor else 0
+        attackers = (
+            (PAWN_ATTACKS[byColor ^ 1][sq] & pieces[PAWN | colorBit])
+            | (KNIGHT_ATTACKS[sq] & pieces[KNIGHT | colorBit])
+            | (KING_ATTACKS[sq] & pieces[KING | colorBit])
+        )
+        queens = pieces[QUEEN | colorBit]
+        for rays, sliders in ((ROOK_RAYS[sq], pieces[ROOK | colorBit] | queens),
+                              (BISHOP_RAYS[sq], pieces[BISHOP | colorBit] | queens)):
+            sliders &= occupied
+            if not sliders:
+                continue
+            for ray in rays:
+                for t in ray:
+                    if BB[t] & occupied:
+                        attackers |= BB[t] & sliders
+                        break
+        return attackers & occupied
+
+    # Static exchange evaluation: material won or lost by the side to move if
+    # both sides keep recapturing on the target square with their cheapest piece
+    def see(self, move):
+        frm = move & 63
+        to = (move >> 6) & 63
+        board = self.board
+        pieces = self.pieces
+        mover = board[frm]
+        occupied = (self.occ[0] | self.occ[1]) ^ BB[frm]
+
+        if board[to]:
+            gains = [SEE_VALUES[board[to] & 7]]
+        elif mover & 7 == PAWN and to == self.ep:
+            gains = [SEE_VALUES[PAWN]]
+            occupied ^= BB[to - 8 if self.side else to + 8]
+        else:
+            gains = [0]
+        attackerValue = SEE_VALUES[(move >> 12) or mover & 7]
+        if move >> 12:
+            gains[0] += SEE_VALUES[move >> 12] - SEE_VALUES[PAWN]
+
+        side = self.side ^ 1
+        while True:
+            attackers = self.attackersTo(to, side, occupied)
+            if not attackers:
+                break
+
+            # Cheapest attacker recaptures
+            colorBit = WHITE_BIT if side else 0
+            for pieceType in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+                bb = attackers & pieces[pieceType | colorBit]
+                if bb:
+                    break
+            gains.append(attackerValue - gains[-1])
+            attackerValue = SEE_VALUES[pieceType]
+            occupied ^= bb & -bb
+            side ^= 1
+
+        # Either side can stop recapturing when it would lose material
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
+    def inCheck(self):
+        return self.isAttacked(self.kingSq[self.side], self.side ^ 1)
+
+    def isCapture(self, move):
+        to = (move >> 6) & 63
+        return self.board[to] != 0 or (to == self.ep and self.board[move & 63] & 7 == PAWN)
+
+    # Checks a move from elsewhere (hash table, killers) could be generated here
+    def isPseudoLegal(self, move):
+        frm = move & 63
+        to = (move >> 6) & 63
+        promo = move >> 12
+        board = self.board
+        us = self.side
+        piece = board[frm]
+        if not piece or (piece >> 3) != us:
+            return False
+        target = board[to]
+        if target and (target >> 3) == us:
+            return False
+
+        pieceType = piece & 7
+        if pieceType == PAWN:
+            if (to >= 56 or to < 8) != bool(promo):
+                return False
+            forward = 8 if us else -8
+            if to == frm + forward:
+                return not target
+            if to == frm + 2 * forward:
+                startRank = 8 <= frm < 16 if us else 48 <= frm < 56
+                return startRank and not target and not board[frm + forward]
+            if PAWN_ATTACKS[us][frm] & BB[to]:
+                return bool(target) or to == self.ep
+            return False
+        if promo:
+            return False
+        if pieceType == KNIGHT:
+            return bool(KNIGHT_ATTACKS[frm] & BB[to])
+        if pieceType == KING:
+            if KING_ATTACKS[frm] & BB[to]:
+                return True
+            return (to - frm == 2 or frm - to == 2) and move in self.genQuiets()
+
+        # Sliders need to be on a matching line with nothing in between
+        if pieceType == BISHOP:
+            lines = BISHOP_LINES[frm]
+        elif pieceType == ROOK:
+            lines = ROOK_LINES[frm]
+        else:
+            lines = BISHOP_LINES[frm] | ROOK_LINES[frm]
+        return bool(lines & BB[to]) and not BETWEEN[frm * 64 + to] & (self.occ[0] | self.occ[1])
+
+    # Generates pseudo-legal captures and queen promotions
+    def genCaptures(self):
+        moves = []
+        us = self.side
+        board = self.board
+        pieces = self.pieces
+        colorBit = WHITE_BIT if us else 0
+        them = self.occ[us ^ 1]
+        occAll = self.occ[0] | self.occ[1]
+
+        # Pawns
+        bb = pieces[PAWN | colorBit]
+        forward = 8 if us else -8
+        while bb:
+            low = bb & -bb
+            frm = low.bit_length() - 1
+            bb ^= low
+            to = frm + forward
+            lastRank = to >= 56 if us else to < 8
+            if lastRank and not board[to]:
+                moves.append(frm | (to << 6) | (QUEEN << 12))
+            targets = PAWN_ATTACKS[us][frm] & them
+            while targets:
+                tlow = targets & -targets
+                to = tlow.bit_length() - 1
+                targets ^= tlow
+                if lastRank:
+                    for promo in PROMOTIONS:
+                        moves.append(frm | (to << 6) | (promo << 12))
+                else:
+                    moves.append(frm | (to << 6))
+            if self.ep >= 0 and PAWN_ATTACKS[us][frm] & BB[self.ep]:
+                moves.append(frm | (self.ep << 6))
+
+        # Knights and king
+        for ptype, table in ((KNIGHT, KNIGHT_ATTACKS), (KING, KING_ATTACKS)):
+            bb = pieces[ptype | colorBit]
+            while bb:
+                low = bb & -bb
+                frm = low.bit_length() - 1
+                bb ^= low
+                targets = table[frm] & them
+                while targets:
+                    tlow = targets & -targets
+                    targets ^= tlow
+                    moves.append(frm | ((tlow.bit_length() - 1) << 6))
+
+        # Sliding pieces, walking each ray until it's blocked
+        for ptype, raysTable in ((BISHOP, BISHOP_RAYS), (ROOK, ROOK_RAYS), (QUEEN, ROOK_RAYS), (QUEEN, BISHOP_RAYS)):
+            bb = pieces[ptype | colorBit]
+            while bb:
+                low = bb & -bb
+                frm = low.bit_length() - 1
+                bb ^= low
+                for ray in raysTable[frm]:
+                    for to in ray:
+                        if BB[to] & occAll:
+                            if BB[to] & them:
+                                moves.append(frm | (to << 6))
+                            break
+        return moves
+
+    # Generates pseudo-legal quiet moves, under-promotions and castling
+    def genQuiets(self):
+        moves = []
+        us = self.side
+        board = self.board
+        pieces = self.pieces
+        colorBit = WHITE_BIT if us else 0
+        occAll = self.occ[0] | self.occ[1]
+        empty = ~occAll
+
+        # Pawns
+        bb = pieces[PAWN | colorBit]
+        forward = 8 if us else -8
+        while bb:
+            low = bb & -bb
+            frm = low.bit_length() - 1
+            bb ^= low
+            to = frm + forward
+            if board[to]:
+                continue
+            if to >= 56 or to < 8:
+                for promo in PROMOTIONS[1:]:
+                    moves.append(frm | (to << 6) | (promo << 12))
+                continue
+            moves.append(frm | (to << 6))
+            startRank = 8 <= frm < 16 if us else 48 <= frm < 56
+            if startRank and not board[to + forward]:
+                moves.append(frm | ((to + forward) << 6))
+
+        # Knights and king
+        for ptype, table in ((KNIGHT, KNIGHT_ATTACKS), (KING, KING_ATTACKS)):
+            bb = pieces[ptype | colorBit]
+            while bb:
+                low = bb & -bb
+                frm = low.bit_length() - 1
+                bb ^= low
+                targets = table[frm] & empty
+                while targets:
+                    tlow = targets & -targets
+                    targets ^= tlow
+                    moves.append(frm | ((tlow.bit_length() - 1) << 6))
+
+        # Sliding pieces
+        for ptype, raysTable in ((BISHOP, BISHOP_RAYS), (ROOK, ROOK_RAYS), (QUEEN, ROOK_RAYS), (QUEEN, BISHOP_RAYS)):
+            bb = pieces[ptype | colorBit]
+            while bb:
+                low = bb & -bb
+                frm = low.bit_length() - 1
+                bb ^= low
+                for ray in raysTable[frm]:
+                    for to in ray:
+                        if BB[to] & occAll:
+                            break
+                        moves.append(frm | (to << 6))
+
+        # Castling, the king can't leave, cross or land on an attacked square
+        rights = self.castling
+        if us == WHITE and rights & (WHITE_OO | WHITE_OOO):
+            if rights & WHITE_OO and not board[chess.F1] and not board[chess.G1] \
+                    and not self.isAttacked(chess.E1, BLACK) and not self.isAttacked(chess.F1, BLACK):
+                moves.append(chess.E1 | (chess.G1 << 6))
+            if rights & WHITE_OOO and not board[chess.D1] and not board[chess.C1] and not board[chess.B1] \
+                    and not self.isAttacked(chess.E1, BLACK) and not self.isAttacked(chess.D1, BLACK):
+                moves.append(chess.E1 | (chess.C1 << 6))
+        elif us == BLACK and rights & (BLACK_OO | BLACK_OOO):
+            if rights & BLACK_OO and not board[chess.F8] and not board[chess.G8] \
+                    and not self.isAttacked(chess.E8, WHITE) and not self.isAttacked(chess.F8, WHITE):
+                moves.append(chess.E8 | (chess.G8 << 6))
+            if rights & BLACK_OOO and not board[chess.D8] and not board[chess.C8] and not board[chess.B8] \
+                    and not self.isAttacked(chess.E8, WHITE) and not self.isAttacked(chess.D8, WHITE):
+                moves.append(chess.E8 | (chess.C8 << 6))
+        return moves
+
+    # Plays a move, returns False (and takes it back) if it leaves the king in check
+    def makeMove(self, move):
+        frm = move & 63
+        to = (move >> 6) & 63
+        promo = move >> 12
+        board = self.board
+        pieces = self.pieces
+        occ = self.occ
+        keys = self.pieceKeys
+        us = self.side
+        them = us ^ 1
+
+        piece = board[frm]
+        captured = board[to]
+        capSq = to
+        if piece & 7 == PAWN and to == self.ep:
+            capSq = to - 8 if us else to + 8
+            captured = board[capSq]
+            board[capSq] = 0
+
+        key = self.key
+        self.stack.append((move, piece, captured, self.castling, self.ep, self.halfmove, key))
+        if self.ep >= 0:
+            key ^= self.epKeys[self.ep & 7]
+
+        # Removes the captured piece
+        if captured:
+            pieces[captured] ^= BB[capSq]
+            occ[them] ^= BB[capSq]
+            key ^= keys[captured * 64 + capSq]
+
+        # Moves the piece, promoting if needed
+        placed = (promo | (piece & WHITE_BIT)) if promo else piece
+        board[frm] = 0
+        board[to] = placed
+        pieces[piece] ^= BB[frm]
+        pieces[placed] ^= BB[to]
+        occ[us] ^= BB[frm] | BB[to]
+        key ^= keys[piece * 64 + frm] ^ keys[placed * 64 + to]
+
+        self.ep = -1
+        if piece & 7 == KING:
+            self.kingSq[us] = to
+
+            # Castling also jumps the rook
+            if to - frm == 2 or frm - to == 2:
+                rookFrom, rookTo = CASTLE_ROOK[to]
+                rook = board[rookFrom]
+                board[rookFrom] = 0
+                board[rookTo] = rook
+                pieces[rook] ^= BB[rookFrom] | BB[rookTo]
+                occ[us] ^= BB[rookFrom] | BB[rookTo]
+                key ^= keys[rook * 64 + rookFrom] ^ keys[rook * 64 + rookTo]
+        elif piece & 7 == PAWN and (to - frm == 16 or frm - to == 16):
+            self.ep = (frm + to) >> 1
+            key ^= self.epKeys[self.ep & 7]
+
+        rights = self.castling & CASTLE_MASK[frm] & CASTLE_MASK[to]
+        if rights != self.castling:
+            key ^= self.castleKeys[self.castling] ^ self.castleKeys[rights]
+            self.castling = rights
+
+        self.halfmove = 0 if captured or piece & 7 == PAWN else self.halfmove + 1
+        self.side = them
+        self.key = key ^ self.sideKey
+        self.history.append(self.key)
+
+        if self.isAttacked(self.kingSq[us], them):
+            self.unmakeMove()
+            return False
+        return True
+
+    # Takes back the last move from the undo stack
+    def unmakeMove(self):
+        move, piece, captured, castling, ep, halfmove, key = self.stack.pop()
+        frm = move & 63
+        to = (move >> 6) & 63
+        board = self.board
+        pieces = self.pieces
+        occ = self.occ
+        us = self.side ^ 1
+
+        placed = board[to]
+        board[to] = 0
+        board[frm] = piece
+        pieces[placed] ^= BB[to]
+        pieces[piece] ^= BB[frm]
+        occ[us] ^= BB[frm] | BB[to]
+
+        if captured:
+            capSq = to
+            if piece & 7 == PAWN and to == ep:
+                capSq = to - 8 if us else to + 8
+            board[capSq] = captured
+            pieces[captured] ^= BB[capSq]
+            occ[us ^ 1] ^= BB[capSq]
+
+        if piece & 7 == KING:
+            self.kingSq[us] = frm
+            if to - frm == 2 or frm - to == 2:
+                rookFrom, rookTo = CASTLE_ROOK[to]
+                rook = board[rookTo]
+                board[rookTo] = 0
+                board[rookFrom] = rook
+                pieces[rook] ^= BB[rookFrom] | BB[rookTo]
+                occ[us] ^= BB[rookFrom] | BB[rookTo]
+
+        self.side = us
+        self.castling = castling
+        self.ep = ep
+        self.halfmove = halfmove
+        self.key = key
+        self.history.pop()
+
+    # Passes the turn for null-move pruning. En passant lapses, and the halfmove
+    # clock restarts so no repetition is found across the null move
+    def makeNull(self):
+        key = self.key
+        self.stack.append((0, 0, 0, self.castling, self.ep, self.halfmove, key))
+        if self.ep >= 0:
+            key ^= self.epKeys[self.ep & 7]
+            self.ep = -1
+        self.halfmove = 0
+        self.side ^= 1
+        self.key = key ^ self.sideKey
+        self.history.append(self.key)
+
+    def unmakeNull(self):
+        _, _, _, castling, ep, halfmove, key = self.stack.pop()
+        self.side ^= 1
+        self.castling = castling
+        self.ep = ep
+        self.halfmove = halfmove
+        self.key = key
+        self.history.pop()
+
+    # Takes back moves and null moves (the records without a piece) until the
+    # undo stack is down to length, for searches abandoned mid-line
+    def unwind(self, length):
+        while len(self.stack) > length:
+            if self.stack[-1][1]:
+                self.unmakeMove()
+            else:
+                self.unmakeNull()
+
+    # Whether a side has anything besides pawns and its king, positions
+    # without are the usual zugzwang cases
+    def hasPieces(self, side):
+        pieces = self.pieces
+        colorBit = WHITE_BIT if side else 0
+        return bool(pieces[KNIGHT | colorBit] | pieces[BISHOP | colorBit]
+                    | pieces[ROOK | colorBit] | pieces[QUEEN | colorBit])
+
+    # Fifty move rule, repetition inside the search or bare minor pieces
+    def isDraw(self):
+        if self.halfmove >= 100:
+            return True
+
+        # Only positions since the last pawn move or capture can repeat
+        history = self.history
+        key = self.key
+        for i in range(len(history) - 3, max(len(history) - self.halfmove - 2, -1), -2):
+            if history[i] == key:
+                return True
+
+        pieces = self.pieces
+        heavy = pieces[PAWN] | pieces[PAWN | WHITE_BIT] | pieces[ROOK] | pieces[ROOK | WHITE_BIT] \
+            | pieces[QUEEN] | pieces[QUEEN | WHITE_BIT]
+        return not heavy and (self.occ[0] | self.occ[1]).bit_count() <= 3
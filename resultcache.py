@@ -0,0 +1,93 @@
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import chess
+import chess.polyglot
+
+
+# Polyglot key covers placement, side to move, castling and en passant, and
+# unlike the engine's own keys is stable across versions and processes
+def positionKey(board: chess.Board):
+    key = chess.polyglot.zobrist_hash(board)
+
+    # sqlite integers are signed
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+class ResultCache:
+
+    # In-memory LRU in front of an optional sqlite file. The file can be shared
+    # by several processes and keeps results across restarts
+    def __init__(self, path=None, maxEntries=100_000):
+        self.maxEntries = maxEntries
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " key INTEGER PRIMARY KEY, position TEXT, move TEXT,"
+                " score INTEGER, depth INTEGER, pv TEXT)"
+            )
+            self.db.commit()
+
+    # Returns {"move", "score", "depth", "pv"} when a result at least minDepth deep is stored
+    def get(self, board: chess.Board, minDepth=0):
+        key = positionKey(board)
+        position = board.epd()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+
+            # Other processes may have stored a deeper result in the file since
+            # this one was remembered, so anything memory can't answer is looked up
+            usable = entry is not None and entry["position"] == position and entry["depth"] >= minDepth
+            if not usable and self.db is not None:
+                row = self.db.execute(
+                    "SELECT position, move, score, depth, pv FROM results WHERE key = ?", (key,)
+                ).fetchone()
+                if row and (entry is None or entry["position"] != position or row[3] >= entry["depth"]):
+                    entry = {"position": row[0], "move": row[1], "score": row[2],
+                             "depth": row[3], "pv": row[4].split() if row[4] else []}
+                    self.remember(key, entry)
+
+        # The position text guards against key collisions
+        if entry is None or entry["position"] != position or entry["depth"] < minDepth:
+            return None
+        return entry
+
+    # Stores a result unless a deeper one is already there
+    def put(self, board: chess.Board, move, score, depth, pv=()):
+        key = positionKey(board)
+        entry = {"position": board.epd(), "move": move, "score": score,
+                 "depth": depth, "pv": list(pv)}
+        with self.lock:
+            old = self.memory.get(key)
+            if old is not None and old["position"] == entry["position"] and old["depth"] > depth:
+                return
+            self.remember(key, entry)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT INTO results (key, position, move, score, depth, pv) VALUES (?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(key) DO UPDATE SET position = excluded.position, move = excluded.move,"
+                    " score = excluded.score, depth = excluded.depth, pv = excluded.pv"
+                    " WHERE excluded.depth >= results.depth OR excluded.position != results.position",
+                    (key, entry["position"], move, score, depth, " ".join(pv)),
+                )
+                self.db.commit()
+
+    # Adds to the memory tier, dropping the least recently used entry when full
+    def remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.maxEntries:
+            self.memory.popitem(last=False)
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -1,25 +1,163 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from chess_engine import ChessEngine
+from batch import BatchAnalyser
+from enginepool import EnginePool, PoolBusy
+from resultcache import ResultCache
+import argparse
 import chess
+import json
+import queue
+import threading
 
 app = Flask(__name__)
 
 CORS(app)
 
 
-engine = ChessEngine(depth=5)
+# Single engine used in development, the lock keeps threaded requests from
+# sharing one search. It's built on first use, so the spawned pool processes
+# (which import this module again) don't each allocate one
+engine = None
+engineLock = threading.Lock()
+
+# Pool of engine processes, only set up when serving with --workers
+pool = None
+
+# Process pool for batch requests, started on the first one. The lock keeps
+# concurrent first requests from each starting a pool
+analyser = None
+analyserLock = threading.Lock()
+
+# Runs one search on the pool or the dev engine and returns the engine's info
+# dict (best move, depth, score, PV, node and hash table counts, book use)
+def search(data, onIteration=None):
+    global engine
+    fen = data['fen']
+
+    # Optional clock in seconds, maxTime caps the think time per move
+    maxTime = float(data['maxTime']) if data.get('maxTime') is not None else None
+    timeLeft = float(data['timeLeft']) if data.get('timeLeft') is not None else None
+    increment = float(data.get('increment', 0.0))
+
+    # Requests with the same gameId go to the worker holding that game's hash table
+    if pool is not None:
+        return pool.bestMove(fen, data.get('gameId'), maxTime, timeLeft, increment, onIteration)
+
+    board = chess.Board(fen)
+    with engineLock:
+        if engine is None:
+            engine = ChessEngine(depth=5, cache=ResultCache())
+        _, info = engine.findBestMove(
+            board,
+            maxTime=maxTime,
+            timeLeft=timeLeft,
+            increment=increment,
+            onIteration=onIteration,
+            returnInfo=True,
+        )
+    return info
+
+
+def busy(e):
+    response = jsonify({'error': str(e)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retryAfter)
+    return response
+
 
 @app.route('/best_move', methods=['POST'])
 def best_move():
     data = request.get_json()
-    fen = data['fen']
+    try:
+        info = search(data)
+    except PoolBusy as e:
+        return busy(e)
+    except TimeoutError as e:
+        return jsonify({'error': str(e)}), 504
 
-    board = chess.Board(fen)
-    best_move = engine.findBestMove(board)
+    # Per-depth stats only when asked for, they grow with the depth reached
+    if not data.get('iterations'):
+        info = {key: value for key, value in info.items() if key != 'iterations'}
+    return jsonify({'bestMove': info['bestMove'], 'info': info})
 
-    return jsonify({'bestMove': best_move.uci()})
+
+# Server-sent events for one search: an "iteration" event as each depth
+# finishes (with its PV, so clients have a move early) and a final "bestmove"
+# event. Takes the same fields as /best_move as query parameters
+@app.route('/analyse', methods=['GET'])
+def analyse():
+    data = request.args.to_dict()
+    events = queue.Queue()
+
+    def run():
+        try:
+            info = search(data, onIteration=lambda record: events.put(('iteration', record)))
+            events.put(('bestmove', info))
+        except PoolBusy as e:
+            events.put(('error', {'error': str(e), 'retryAfter': e.retryAfter}))
+        except Exception as e:
+            events.put(('error', {'error': str(e)}))
+
+    threading.Thread(target=run, daemon=True).start()
+
+    def stream():
+        while True:
+            kind, payload = events.get()
+            yield f'event: {kind}\ndata: {json.dumps(payload)}\n\n'
+            if kind != 'iteration':
+                break
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+# Takes {"fens": [...]} (FEN strings or {"fen", "id"} objects) plus an optional
+# depth or maxTime, and streams one NDJSON result per position as each finishes
+@app.route('/best_moves', methods=['POST'])
+def best_moves():
+    global analyser
+    data = request.get_json()
+
+    positions = []
+    for item in data['fens']:
+        if isinstance(item, dict):
+            positions.append((item['fen'], item.get('id')))
+        else:
+            positions.append((item, None))
+
+    with analyserLock:
+        if analyser is None:
+            analyser = BatchAnalyser()
+
+    results = analyser.analyse(positions, data.get('depth'), data.get('maxTime'))
+    lines = (json.dumps(result) + '\n' for result in results)
+    return Response(stream_with_context(lines), mimetype='application/x-ndjson')
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    parser = argparse.ArgumentParser(description="Chess engine server")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="serve from a pool of engine processes instead of one engine")
+    parser.add_argument('--max-queue', type=int, default=4,
+                        help="requests queued per worker before answering 503")
+    parser.add_argument('--idle-timeout', type=float, default=600.0,
+                        help="seconds before an idle game's engine is dropped")
+    parser.add_argument('--max-sessions', type=int, default=32,
+                        help="games kept per worker, the least recently used is dropped past this")
+    parser.add_argument('--cache', help="sqlite file that keeps search results across restarts")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.workers:
+        pool = EnginePool(args.workers, args.max_queue, args.idle_timeout, cachePath=args.cache,
+                          maxSessions=args.max_sessions)
+        try:
+            app.run(host=args.host, port=args.port, threaded=True)
+        finally:
+            pool.close()
+    else:
+        if args.cache:
+            engine = ChessEngine(depth=5, cache=ResultCache(args.cache))
+        app.run(host=args.host, port=args.port, debug=True)
@@ -0,0 +1,105 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+from transposition import ENTRY_BYTES, TranspositionTable, tableEntries
+
+# Processes are spawned so they don't inherit a half-initialized server
+context = mp.get_context("spawn")
+
+
+# Runs in each helper process: searches whatever root it's sent until the
+# shared stop event is set or the deadline passes, then reports back
+def helperMain(shmName, ttMb, conn, stopFlag, helperId):
+    import chess
+    from chess_engine import ChessEngine
+    from timeman import TimeManager
+
+    shm = shared_memory.SharedMemory(name=shmName)
+    engine = ChessEngine(bookPath=None, tt_mb=0)
+    engine.transpositionTable = TranspositionTable(ttMb, shm.buf)
+    engine.stopFlag = stopFlag
+
+    try:
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+            jobId, fen, age, deadline = job
+            engine.transpositionTable.age = age
+
+            # Odd helpers start a ply deeper so the threads don't all search the same tree
+            board = chess.Board(fen)
+            timer = TimeManager.until(deadline, stopFlag)
+            move, depth, score = engine.search(engine.newPosition(board), engine.fullEvaluate(board),
+                                               timer, startDepth=1 + helperId % 2)
+            conn.send((jobId, move, depth, score, engine.nodes, engine.qnodes))
+    finally:
+        engine.transpositionTable.release()
+        shm.close()
+
+
+class SmpPool:
+
+    # Allocates the shared hash table, helper processes start on the first search
+    def __init__(self, helpers, ttMb):
+        self.helpers = helpers
+        self.ttMb = ttMb
+        self.shm = shared_memory.SharedMemory(create=True, size=tableEntries(ttMb) * ENTRY_BYTES)
+        self.buffer = self.shm.buf
+        self.stopFlag = context.Event()
+        self.processes = []
+        self.conns = []
+        self.jobId = 0
+
+    def ensureStarted(self):
+        if self.processes:
+            return
+        for helperId in range(self.helpers):
+            parentConn, childConn = context.Pipe()
+            proc = context.Process(target=helperMain, daemon=True,
+                                   args=(self.shm.name, self.ttMb, childConn, self.stopFlag, helperId))
+            proc.start()
+            self.processes.append(proc)
+            self.conns.append(parentConn)
+
+    # Sends the root to every helper
+    def start(self, fen, age, deadline):
+        self.ensureStarted()
+        self.stopFlag.clear()
+        self.jobId += 1
+        for conn in self.conns:
+            conn.send((self.jobId, fen, age, deadline))
+
+    # Stops the helpers and returns their (move, depth, score, nodes, qnodes) results
+    def collect(self, timeout=1.0):
+        self.stopFlag.set()
+        results = []
+        for conn in self.conns:
+
+            # Skips late replies to earlier searches that timed out here, and
+            # helpers that died
+            try:
+                while conn.poll(timeout):
+                    jobId, *result = conn.recv()
+                    if jobId == self.jobId:
+                        results.append(tuple(result))
+                        break
+            except (EOFError, OSError):
+                continue
+        return results
+
+    def close(self):
+        self.stopFlag.set()
+        for conn in self.conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self.processes:
+            proc.join(timeout=1.0)
+            if proc.is_alive():
+                proc.terminate()
+        self.processes, self.conns = [], []
+        self.buffer = None
+        self.shm.close()
+        self.shm.unlink()
@@ -0,0 +1,28 @@
+import random
+
+import chess
+
+from chess_engine import ChessEngine
+
+
+# Engines seeded alike pick the same book moves whatever else uses random
+def test_seeded_book_choices():
+    games = []
+    for seed in (1, 1):
+        engine = ChessEngine(bookRng=random.Random(seed), tt_mb=1)
+        random.random()
+        board = chess.Board()
+        moves = []
+        for _ in range(6):
+            move = engine.bookMove(board)
+            if move is None:
+                break
+            moves.append(move.uci())
+            board.push(move)
+        games.append(moves)
+    assert games[0] and games[0] == games[1]
+
+
+def test_weighted_merge_from_engine():
+    engine = ChessEngine(bookPath=["Perfect2023.bin", ("Perfect2023.bin", 2.0)], bookMerge="weighted", tt_mb=1)
+    assert engine.book.moves(chess.Board())
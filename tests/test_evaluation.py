@@ -0,0 +1,23 @@
+import chess
+import pytest
+
+import evaluation
+from bench import POSITIONS
+
+FENS = POSITIONS + ["3qkn1r/r1pp4/b2b1p2/p3p2p/p1P1P1p1/PP3n1P/3PK3/R1BQ1BNR w - - 0 22"]
+
+
+# A position and its colour mirror are the same position for the side to move
+@pytest.mark.parametrize("fen", FENS)
+def test_mirror_symmetry(fen):
+    board = chess.Board(fen)
+    assert evaluation.evaluate(board) == evaluation.evaluate(board.mirror())
+
+
+def test_batch_matches_evaluate():
+    pytest.importorskip("numpy")
+    boards = [chess.Board(fen) for fen in FENS]
+    mirrored = [board.mirror() for board in boards]
+    scores = evaluation.evaluateBatch(FENS + mirrored)
+    assert list(scores) == [evaluation.evaluate(board) for board in boards + mirrored]
+    assert list(scores[:len(FENS)]) == list(scores[len(FENS):])
@@ -0,0 +1,97 @@
+import random
+
+import chess
+import pytest
+
+from chess_engine import ChessEngine
+
+engine = ChessEngine(bookPath=None)
+
+# Standard perft positions with known node counts
+PERFT = [
+    (chess.STARTING_FEN, 3, 8902),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 2, 2039),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 4, 43238),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", 3, 9467),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 3, 62379),
+]
+
+
+def encode(move: chess.Move):
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def perft(pos, depth):
+    if depth == 0:
+        return 1
+    nodes = 0
+    for mv in pos.genCaptures() + pos.genQuiets():
+        if pos.makeMove(mv):
+            nodes += perft(pos, depth - 1)
+            pos.unmakeMove()
+    return nodes
+
+
+def legalMoves(pos):
+    legal = []
+    for mv in pos.genCaptures() + pos.genQuiets():
+        if pos.makeMove(mv):
+            pos.unmakeMove()
+            legal.append(mv)
+    return legal
+
+
+def snapshot(pos):
+    return (list(pos.board), list(pos.pieces), list(pos.occ), list(pos.kingSq),
+            pos.side, pos.castling, pos.ep, pos.halfmove, pos.key)
+
+
+@pytest.mark.parametrize("fen,depth,expected", PERFT)
+def test_perft(fen, depth, expected):
+    pos = engine.newPosition(chess.Board(fen))
+    before = snapshot(pos)
+    assert perft(pos, depth) == expected
+    assert snapshot(pos) == before
+
+
+# Plays random games checking the legal moves, the incremental key and the
+# undo stack against python-chess and positions built from scratch
+def test_random_games():
+    rng = random.Random(7)
+    for _ in range(20):
+        board = chess.Board()
+        pos = engine.newPosition(board)
+        start = snapshot(pos)
+        for _ in range(120):
+            legal = legalMoves(pos)
+            assert sorted(legal) == sorted(encode(mv) for mv in board.legal_moves)
+            if not legal:
+                break
+            mv = rng.choice(legal)
+            board.push(chess.Move(mv & 63, (mv >> 6) & 63, (mv >> 12) or None))
+            assert pos.makeMove(mv)
+            assert pos.key == pos.computeKey() == engine.newPosition(board).key
+
+        while pos.stack:
+            pos.unmakeMove()
+        assert snapshot(pos) == start
+
+
+def test_null_move_round_trip():
+    pos = engine.newPosition(chess.Board("rnbqkbnr/ppp1pppp/8/3pP3/8/8/PPPP1PPP/RNBQKBNR b KQkq d6 0 3"))
+    before = snapshot(pos)
+    pos.makeNull()
+    assert pos.key == pos.computeKey()
+    pos.unmakeNull()
+    assert snapshot(pos) == before
+
+
+@pytest.mark.parametrize("fen,uci,expected", [
+    ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1e5", 100),
+    ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3e5", -220),
+    ("4k3/8/2p5/3p4/4P3/8/8/4K3 w - - 0 1", "e4d5", 0),
+    ("3rk3/8/8/3p4/8/8/3R4/3QK3 w - - 0 1", "d2d5", 100),
+])
+def test_see(fen, uci, expected):
+    pos = engine.newPosition(chess.Board(fen))
+    assert pos.see(encode(chess.Move.from_uci(uci))) == expected
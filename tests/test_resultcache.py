@@ -0,0 +1,35 @@
+import chess
+
+from resultcache import ResultCache
+
+
+# Two processes sharing one file: a deeper result stored by one is found by
+# the other even when it remembers a shallower one
+def test_deeper_result_from_another_cache(tmp_path):
+    path = str(tmp_path / "results.db")
+    board = chess.Board()
+    first, second = ResultCache(path), ResultCache(path)
+    try:
+        first.put(board, "e2e4", 20, 5, ["e2e4"])
+        assert first.get(board, 5)["depth"] == 5
+        second.put(board, "d2d4", 25, 8, ["d2d4", "d7d5"])
+
+        entry = first.get(board, 6)
+        assert entry["depth"] == 8 and entry["move"] == "d2d4"
+        assert first.get(board, 9) is None
+    finally:
+        first.close()
+        second.close()
+
+
+def test_memory_only():
+    cache = ResultCache(maxEntries=1)
+    board = chess.Board()
+    cache.put(board, "e2e4", 20, 5)
+    assert cache.get(board, 5)["move"] == "e2e4"
+    assert cache.get(board, 6) is None
+
+    # Oldest entry goes when full
+    other = chess.Board("8/8/8/4k3/8/8/8/3RK3 w - - 0 1")
+    cache.put(other, "d1d2", 500, 3)
+    assert cache.get(board) is None
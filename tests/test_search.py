@@ -0,0 +1,62 @@
+import chess
+import pytest
+
+from bench import POSITIONS
+from chess_engine import ChessEngine, MAX_PLY
+from timeman import TimeManager
+
+
+@pytest.fixture
+def engine():
+    return ChessEngine(bookPath=None, tt_mb=1)
+
+
+# Dead draws and mates inside the horizon stop deepening right away
+@pytest.mark.parametrize("fen,depth", [
+    ("8/8/8/4k3/8/8/8/4K3 w - - 0 1", 1),
+    ("8/8/8/4k3/8/8/8/3NK3 w - - 0 1", 1),
+    ("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", 1),
+])
+def test_proven_results_stop_deepening(engine, fen, depth):
+    move, info = engine.findBestMove(chess.Board(fen), maxTime=5.0, returnInfo=True)
+    assert info["depth"] == depth
+    assert len(info["iterations"]) == depth
+
+
+def test_depth_is_capped(engine):
+    _, info = engine.findBestMove(chess.Board("8/8/8/4k3/8/8/8/3RK3 w - - 0 1"), maxTime=0.5,
+                                  maxDepth=10 * MAX_PLY, returnInfo=True)
+    assert info["depth"] <= MAX_PLY
+
+
+def snapshot(pos):
+    return (list(pos.board), list(pos.pieces), list(pos.occ), list(pos.kingSq),
+            pos.side, pos.castling, pos.ep, pos.halfmove, pos.key, list(pos.history), list(pos.stack))
+
+
+# Stop flag that trips on the given poll, so searches abort at a
+# reproducible point of the tree
+class StopAfter:
+
+    def __init__(self, polls):
+        self.polls = polls
+
+    def is_set(self):
+        self.polls -= 1
+        return self.polls < 0
+
+
+# Searches aborted anywhere in the tree, under null moves included, leave the
+# root exactly as a fresh position
+def test_aborted_searches_restore_the_root(engine):
+    aborted = 0
+    for fen in POSITIONS:
+        board = chess.Board(fen)
+        for polls in range(1, 6):
+            engine.newGame()
+            engine.stopFlag = StopAfter(polls)
+            pos = engine.newPosition(board)
+            engine.search(pos, engine.fullEvaluate(board), TimeManager(float("inf")))
+            assert snapshot(pos) == snapshot(engine.newPosition(board))
+            aborted += engine.aborted
+    assert aborted
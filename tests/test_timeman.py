@@ -0,0 +1,26 @@
+import pytest
+
+from timeman import TimeManager, DEFAULT_MOVE_TIME
+
+
+def test_default_budget():
+    timer = TimeManager()
+    assert timer.hard == DEFAULT_MOVE_TIME
+    assert timer.soft == DEFAULT_MOVE_TIME / 2
+
+
+# A long clock buys more than the default, and maxTime only caps it when given
+def test_clock_budget():
+    timer = TimeManager(timeLeft=600, increment=2)
+    assert timer.hard > DEFAULT_MOVE_TIME
+    capped = TimeManager(2.0, timeLeft=600, increment=2)
+    assert capped.hard == 2.0
+
+
+# The soft limit leaves room for the iteration it lets start
+@pytest.mark.parametrize("maxTime,timeLeft,increment", [
+    (None, None, 0), (1.0, None, 0), (None, 600, 2), (2.0, 600, 2), (None, 1.0, 0), (0.05, 3.0, 1.0),
+])
+def test_soft_is_at_most_half_of_hard(maxTime, timeLeft, increment):
+    timer = TimeManager(maxTime, timeLeft, increment)
+    assert 0 <= timer.soft <= timer.hard / 2
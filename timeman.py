@@ -0,0 +1,64 @@
+import time
+
+# How many nodes the search visits between clock checks
+CHECK_EVERY = 1024
+
+# Think time per move when there's neither a clock nor a maxTime
+DEFAULT_MOVE_TIME = 2.0
+
+
+# Raised inside the search once the hard deadline passes
+class SearchTimeout(Exception):
+    pass
+
+
+class TimeManager:
+
+    # Splits the budget for one move into a soft limit (don't start another
+    # iteration) and a hard limit (abort the iteration in progress). The soft
+    # limit is at most half the hard one, so an iteration started late still
+    # has room to finish. maxTime caps the move when given
+    def __init__(self, maxTime=None, timeLeft=None, increment=0.0, movesToGo=None, overhead=0.05):
+        if timeLeft is None:
+            hard = DEFAULT_MOVE_TIME if maxTime is None else maxTime
+            soft = hard * 0.5
+        else:
+            # Spreads the remaining clock over the expected rest of the game
+            movesToGo = movesToGo or 30
+            usable = max(0.0, timeLeft - overhead)
+            soft = usable / movesToGo + increment * 0.75
+            hard = min(soft * 3, usable * 0.5)
+            soft = min(soft, hard * 0.5)
+
+            # Shrinks both limits together when maxTime is tighter
+            if maxTime is not None and hard > maxTime:
+                soft *= maxTime / hard
+                hard = maxTime
+
+        self.soft = soft
+        self.hard = hard
+        self.start = time.perf_counter()
+        self.deadline = self.start + hard
+        self.stopFlag = None
+
+    # Searches until an absolute deadline or until the stop event is set,
+    # used by helper searches that are stopped by the main one
+    @classmethod
+    def until(cls, deadline, stopFlag=None):
+        timer = cls(max(0.0, deadline - time.perf_counter()))
+        timer.soft = timer.hard
+        timer.deadline = deadline
+        timer.stopFlag = stopFlag
+        return timer
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    # Decides whether another iteration is worth starting, stopping sooner the
+    # longer the best move has stayed the same
+    def shouldStop(self, stableIterations=0):
+        elapsed = time.perf_counter() - self.start
+        if elapsed >= self.hard or self.stopFlag is not None and self.stopFlag.is_set():
+            return True
+        scale = max(0.4, 1.0 - 0.15 * stableIterations)
+        return elapsed >= self.soft * scale
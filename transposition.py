@@ -0,0 +1,98 @@
+import array
+
+# Bound types stored with each entry
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Bit layout of the packed data word
+SCORE_BITS  = 32
+SCORE_BIAS  = 1 << 31
+MOVE_SHIFT  = 32
+DEPTH_SHIFT = 48
+BOUND_SHIFT = 56
+AGE_SHIFT   = 58
+AGE_MASK    = 0x3F
+
+# Each slot is two 64 bit words (key ^ data, data)
+ENTRY_BYTES = 16
+KEY_MASK    = 0xFFFFFFFFFFFFFFFF
+
+
+# Number of slots that fit in sizeMb, rounded down to a power of two so
+# indexing is a single mask
+def tableEntries(sizeMb):
+    entries = max(1, int(sizeMb * 1024 * 1024) // ENTRY_BYTES)
+    return 1 << (entries.bit_length() - 1)
+
+
+class TranspositionTable:
+
+    # Preallocates every slot up front so memory stays flat during the search.
+    # An existing buffer (e.g. shared memory) can back the table instead
+    def __init__(self, sizeMb=16, buffer=None):
+        self.size = tableEntries(sizeMb)
+        self.mask = self.size - 1
+        if buffer is None:
+            self.slots = array.array("Q", bytes(self.size * ENTRY_BYTES))
+        else:
+            self.slots = memoryview(buffer)[:self.size * ENTRY_BYTES].cast("Q")
+        self.age = 0
+
+    # Starts a new search, older entries become the first to be replaced
+    def newSearch(self):
+        self.age = (self.age + 1) & AGE_MASK
+
+    # Wipes every entry
+    def clear(self):
+        if isinstance(self.slots, memoryview):
+            self.slots.cast("B")[:] = bytes(self.size * ENTRY_BYTES)
+        else:
+            self.slots = array.array("Q", bytes(self.size * ENTRY_BYTES))
+        self.age = 0
+
+    # Drops the view of a borrowed buffer so it can be closed
+    def release(self):
+        if isinstance(self.slots, memoryview):
+            self.slots.release()
+        self.slots = array.array("Q", bytes(ENTRY_BYTES))
+        self.size, self.mask = 1, 0
+
+    # Returns (depth, score, bound, move) or None when the key isn't stored
+    def probe(self, key):
+        i = (key & self.mask) << 1
+        data = self.slots[i + 1]
+
+        # Key is stored xor'd with the data so torn or stale slots never match
+        if self.slots[i] ^ data != key or not data:
+            return None
+        return (
+            (data >> DEPTH_SHIFT) & 0xFF,
+            (data & 0xFFFFFFFF) - SCORE_BIAS,
+            (data >> BOUND_SHIFT) & 0x3,
+            (data >> MOVE_SHIFT) & 0xFFFF,
+        )
+
+    # Stores an entry, keeping deeper results from the current search
+    def store(self, key, depth, score, bound, move=0):
+        i = (key & self.mask) << 1
+        old = self.slots[i + 1]
+        sameKey = self.slots[i] ^ old == key
+
+        if old and not sameKey and ((old >> AGE_SHIFT) & AGE_MASK) == self.age \
+                and ((old >> DEPTH_SHIFT) & 0xFF) > depth:
+            return
+
+        # Keeps the old best move if the new entry doesn't have one
+        if not move and sameKey:
+            move = (old >> MOVE_SHIFT) & 0xFFFF
+
+        data = (
+            (score + SCORE_BIAS)
+            | (move << MOVE_SHIFT)
+            | (min(depth, 0xFF) << DEPTH_SHIFT)
+            | (bound << BOUND_SHIFT)
+            | (self.age << AGE_SHIFT)
+        )
+        self.slots[i] = key ^ data
+        self.slots[i + 1] = data